@@ -1,13 +1,90 @@
 #!/usr/bin/env python3
 # debug_test.py - Debug test to see what's happening
 
-import requests
 import json
 import time
 import subprocess
 import signal
 import os
 import sys
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# One pooled session for every request so calls reuse keep-alive connections.
+# Built on first use so importing this module (e.g. during test discovery)
+# doesn't pay for importing requests.
+_SESSION = None
+
+
+def get_session():
+    """Return the shared pooled requests.Session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _SESSION = requests.Session()
+        _SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=20))
+        _SESSION.headers['Content-Type'] = 'application/json'
+    return _SESSION
+
+
+# Resolve paths once; prefer $SYNCPAY_PY, then the project venv, then this interpreter
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(HERE, 'src')
+_VENV_PYTHON = os.path.join(HERE, 'syncpay_env', 'bin', 'python3')
+PYTHON = os.environ.get('SYNCPAY_PY') or (_VENV_PYTHON if os.path.isfile(_VENV_PYTHON) else sys.executable)
+NODE1_CMD = (PYTHON, 'main.py', 'node1')
+
+
+def wait_ready(url, deadline=15.0, interval=0.05):
+    """Poll url until it answers 200 or the deadline passes"""
+    import requests
+    session = get_session()
+    start = time.monotonic()
+    while time.monotonic() - start < deadline:
+        try:
+            response = session.get(url, timeout=0.5)
+            if response.status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return False
+
+
+def fetch_all(names, base_url='http://localhost:5000', timeout=5):
+    """GET several independent endpoints concurrently, keyed by endpoint name"""
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {
+            name: executor.submit(session.get, f"{base_url}/{name}", timeout=timeout)
+            for name in names
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def start_output_drain(process):
+    """Continuously read process stdout into a queue so the child never blocks on a full pipe"""
+    output_queue = queue.Queue()
+
+    def drain():
+        for line in iter(process.stdout.readline, b''):
+            output_queue.put(line)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return output_queue
+
+
+def dump_output(output_queue):
+    """Return everything the drain thread has collected so far"""
+    lines = []
+    while True:
+        try:
+            lines.append(output_queue.get_nowait())
+        except queue.Empty:
+            break
+    return b''.join(lines).decode(errors='replace')
 
 def debug_single_node():
     """Debug a single SyncPay node"""
@@ -16,32 +93,35 @@ def debug_single_node():
     
     # Start node1 in background
     print("🚀 Starting node1...")
-    src_dir = os.path.join(os.path.dirname(__file__), 'src')
-    venv_python = os.path.join(os.path.dirname(__file__), 'syncpay_env', 'bin', 'python3')
-    
     process = subprocess.Popen(
-        [venv_python, 'main.py', 'node1'],
-        cwd=src_dir,
+        NODE1_CMD,
+        cwd=SRC_DIR,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        preexec_fn=os.setsid  # Create new process group
+        start_new_session=True  # New process group (setsid in C, no Python preexec hook)
     )
+    output_queue = start_output_drain(process)
     
     try:
         # Wait for node to start
         print("⏳ Waiting for node to start...")
-        time.sleep(10)
+        if not wait_ready('http://localhost:5000/health'):
+            print("❌ Node did not become ready in time")
+            return
+        
+        # Fetch health and status endpoints concurrently
+        responses = fetch_all(('health', 'status'))
         
         # Test health endpoint
         print("🔍 Testing health endpoint...")
-        response = requests.get('http://localhost:5000/health', timeout=5)
+        response = responses['health']
         print(f"Health response: {response.status_code}")
         if response.status_code == 200:
             print(json.dumps(response.json(), indent=2))
         
         # Test status endpoint
         print("\n🔍 Testing status endpoint...")
-        response = requests.get('http://localhost:5000/status', timeout=5)
+        response = responses['status']
         print(f"Status response: {response.status_code}")
         if response.status_code == 200:
             print(json.dumps(response.json(), indent=2))
@@ -54,10 +134,9 @@ def debug_single_node():
             'receiver': 'bob'
         }
         
-        response = requests.post(
+        response = get_session().post(
             'http://localhost:5000/payment',
             json=payment_data,
-            headers={'Content-Type': 'application/json'},
             timeout=5
         )
         
@@ -66,29 +145,22 @@ def debug_single_node():
         
         # Get server output
         print("\n📝 Server output:")
-        output, _ = process.communicate(timeout=2)
-        print(output.decode())
+        print(dump_output(output_queue))
         
     except Exception as e:
         print(f"❌ Error: {e}")
-        # Try to get server output on error
-        try:
-            output, _ = process.communicate(timeout=1)
-            print(f"Server output on error: {output.decode()}")
-        except:
-            pass
+        # Show whatever server output has been collected
+        print(f"Server output on error: {dump_output(output_queue)}")
         
     finally:
         # Stop the node
         print("🛑 Stopping node...")
+        # The node has no state to flush, so skip the SIGTERM grace period
         try:
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-            process.wait(timeout=2)
-        except:
-            try:
-                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-            except:
-                pass
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait(timeout=1)
+        except (ProcessLookupError, OSError, subprocess.TimeoutExpired):
+            pass
 
 if __name__ == '__main__':
     debug_single_node()
\ No newline at end of file
@@ -1,13 +1,65 @@
 #!/usr/bin/env python3
 # simple_test.py - Simple functional test of SyncPay node
 
-import requests
 import json
 import time
 import subprocess
 import signal
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# One pooled session for every request so calls reuse keep-alive connections.
+# Built on first use so importing this module (e.g. during test discovery)
+# doesn't pay for importing requests.
+_SESSION = None
+
+
+def get_session():
+    """Return the shared pooled requests.Session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _SESSION = requests.Session()
+        _SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=20))
+        _SESSION.headers['Content-Type'] = 'application/json'
+    return _SESSION
+
+
+# Resolve paths once; prefer $SYNCPAY_PY, then the project venv, then this interpreter
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(HERE, 'src')
+_VENV_PYTHON = os.path.join(HERE, 'syncpay_env', 'bin', 'python3')
+PYTHON = os.environ.get('SYNCPAY_PY') or (_VENV_PYTHON if os.path.isfile(_VENV_PYTHON) else sys.executable)
+NODE1_CMD = (PYTHON, 'main.py', 'node1')
+
+
+def wait_ready(url, deadline=15.0, interval=0.05):
+    """Poll url until it answers 200 or the deadline passes"""
+    import requests
+    session = get_session()
+    start = time.monotonic()
+    while time.monotonic() - start < deadline:
+        try:
+            response = session.get(url, timeout=0.5)
+            if response.status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return False
+
+
+def fetch_all(names, base_url='http://localhost:5000', timeout=5):
+    """GET several independent endpoints concurrently, keyed by endpoint name"""
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {
+            name: executor.submit(session.get, f"{base_url}/{name}", timeout=timeout)
+            for name in names
+        }
+        return {name: future.result() for name, future in futures.items()}
 
 def test_single_node():
     """Test a single SyncPay node functionality"""
@@ -16,25 +68,27 @@ def test_single_node():
     
     # Start node1 in background
     print("🚀 Starting node1...")
-    src_dir = os.path.join(os.path.dirname(__file__), 'src')
-    venv_python = os.path.join(os.path.dirname(__file__), 'syncpay_env', 'bin', 'python3')
-    
     process = subprocess.Popen(
-        [venv_python, 'main.py', 'node1'],
-        cwd=src_dir,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        preexec_fn=os.setsid  # Create new process group
+        NODE1_CMD,
+        cwd=SRC_DIR,
+        stdout=subprocess.DEVNULL,  # Output is never read; a PIPE could fill and block the node
+        stderr=subprocess.DEVNULL,
+        start_new_session=True  # New process group (setsid in C, no Python preexec hook)
     )
     
     try:
         # Wait for node to start
         print("⏳ Waiting for node to start...")
-        time.sleep(8)
+        if not wait_ready('http://localhost:5000/health'):
+            print("❌ Node did not become ready in time")
+            return False
+        
+        # Fetch health and status endpoints concurrently
+        responses = fetch_all(('health', 'status'))
         
         # Test health endpoint
         print("🔍 Testing health endpoint...")
-        response = requests.get('http://localhost:5000/health', timeout=5)
+        response = responses['health']
         if response.status_code == 200:
             health_data = response.json()
             print(f"✅ Health check passed: {health_data['node_id']} - {health_data['status']}")
@@ -44,7 +98,7 @@ def test_single_node():
         
         # Test status endpoint
         print("🔍 Testing status endpoint...")
-        response = requests.get('http://localhost:5000/status', timeout=5)
+        response = responses['status']
         if response.status_code == 200:
             status_data = response.json()
             print(f"✅ Status check passed: Leader={status_data['is_leader']}")
@@ -60,10 +114,9 @@ def test_single_node():
             'receiver': 'bob_test'
         }
         
-        response = requests.post(
+        response = get_session().post(
             'http://localhost:5000/payment',
             json=payment_data,
-            headers={'Content-Type': 'application/json'},
             timeout=5
         )
         
@@ -73,7 +126,7 @@ def test_single_node():
             
             # Test transactions endpoint
             time.sleep(2)
-            response = requests.get('http://localhost:5000/transactions', timeout=5)
+            response = get_session().get('http://localhost:5000/transactions', timeout=5)
             if response.status_code == 200:
                 txns = response.json()['transactions']
                 if len(txns) > 0:
@@ -96,14 +149,12 @@ def test_single_node():
     finally:
         # Stop the node
         print("🛑 Stopping node...")
+        # The node has no state to flush, so skip the SIGTERM grace period
         try:
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-            process.wait(timeout=5)
-        except:
-            try:
-                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-            except:
-                pass
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait(timeout=1)
+        except (ProcessLookupError, OSError, subprocess.TimeoutExpired):
+            pass
 
 if __name__ == '__main__':
     success = test_single_node()
@@ -1,113 +1,242 @@
-import json
+import copy
+import functools
 import os
+from collections import namedtuple
+from types import MappingProxyType
 from typing import List, Dict, Any, Optional
+from utils import json_codec
+
+# Parsed config files keyed by (abspath, mtime_ns, size) so repeated loads of an
+# unchanged file skip the filesystem read and JSON parse
+_CONFIG_CACHE: Dict[tuple, Dict[str, Any]] = {}
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_node_configs(raw: str) -> Dict[str, Any]:
+    """Parse the SYNCPAY_NODE_CONFIGS env var (memoized on the raw string)"""
+    return json_codec.loads(raw)
+
+
+def _node_configs_from_env(raw: str) -> Dict[str, Any]:
+    # Copy so instances can't mutate the memoized parse
+    return copy.deepcopy(_parse_node_configs(raw))
+
+
+def _coerce_setting(expected: type, value):
+    """Convert a config file value to the setting's type, or raise ValueError/TypeError"""
+    if expected is dict:
+        if not isinstance(value, dict):
+            raise TypeError(value)
+        # Copy so callers can't mutate the cached file data
+        return copy.deepcopy(value)
+    # JSON true/false would otherwise pass as 1/0
+    if isinstance(value, bool):
+        raise TypeError(value)
+    # Don't silently truncate 2.7 to 2
+    if expected is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return expected(value)
+
+
+# Immutable per-node record built once node_configs is final
+NodeAddress = namedtuple('NodeAddress', ['node_id', 'host', 'port', 'url'])
+
+
+# Environment overrides: env var -> (attribute, coercion)
+_ENV_TABLE = {
+    'SYNCPAY_NODE_CONFIGS': ('node_configs', _node_configs_from_env),
+    'SYNCPAY_CONSENSUS_TIMEOUT': ('consensus_timeout', float),
+    'SYNCPAY_CONSENSUS_HEARTBEAT_INTERVAL': ('consensus_heartbeat_interval', float),
+    'SYNCPAY_CONSENSUS_ELECTION_TIMEOUT_MIN': ('consensus_election_timeout_min', float),
+    'SYNCPAY_CONSENSUS_ELECTION_TIMEOUT_MAX': ('consensus_election_timeout_max', float),
+    'SYNCPAY_HEALTH_CHECK_INTERVAL': ('health_check_interval', float),
+    'SYNCPAY_REPLICATION_TIMEOUT': ('replication_timeout', float),
+}
+
 
 class Config:
     """Configuration manager for SyncPay nodes"""
     
-    def __init__(self, config_file: str = None):
-        # Default configuration
-        self.node_configs = {
-            "node1": {"host": "localhost", "port": 5000},
-            "node2": {"host": "localhost", "port": 5001},  
-            "node3": {"host": "localhost", "port": 5002}
-        }
-        
+    # Shared instances for Config.get(): path -> (instance, (file mtime_ns, env overrides))
+    _INSTANCES: Dict[Optional[str], tuple] = {}
+    
+    # Default cluster layout; read-only, copied into each instance
+    _DEFAULT_NODE_CONFIGS = MappingProxyType({
+        "node1": MappingProxyType({"host": "localhost", "port": 5000}),
+        "node2": MappingProxyType({"host": "localhost", "port": 5001}),
+        "node3": MappingProxyType({"host": "localhost", "port": 5002})
+    })
+    
+    # Scalar defaults, applied to every instance before file/env overrides
+    _DEFAULTS = MappingProxyType({
         # Consensus settings
-        self.consensus_timeout = 5.0
-        self.consensus_heartbeat_interval = 1.0
-        self.consensus_election_timeout_min = 5.0
-        self.consensus_election_timeout_max = 10.0
+        # All in seconds; elections wait a random time between min and max,
+        # which should be several heartbeat intervals
+        'consensus_timeout': 2.0,  # per-RPC timeout, and the bound on a commit round
+        'consensus_heartbeat_interval': 0.1,
+        'consensus_election_timeout_min': 0.3,
+        'consensus_election_timeout_max': 0.6,
         
         # Health monitoring settings
-        self.health_check_interval = 10.0
-        self.health_failure_threshold = 3
-        self.health_check_timeout = 5.0
+        'health_check_interval': 10.0,
+        'health_failure_threshold': 3,
+        'health_check_timeout': 5.0,
         
         # Replication settings
-        self.replication_timeout = 5.0
-        self.replication_max_retries = 3
-        self.replication_retry_delay = 1.0
-        self.replication_batch_size = 10
-        self.replication_worker_count = 3
+        'replication_timeout': 5.0,
+        'replication_max_retries': 3,
+        'replication_retry_delay': 1.0,
+        'replication_batch_size': 10,
+        'replication_batch_max_wait_ms': 5.0,
+        'replication_worker_count': 3,
         
         # Time synchronization settings
-        self.time_sync_interval = 30.0
-        self.time_sync_timeout = 5.0
-        self.time_sync_min_samples = 3
-        self.time_sync_max_samples = 10
+        'time_sync_interval': 30.0,
+        'time_sync_timeout': 5.0,
+        'time_sync_min_samples': 3,
+        'time_sync_max_samples': 10,
+        'time_sync_max_skew': 2.0,  # seconds synchronized time may differ from local
         
         # Payment limits
-        self.payment_max_amount = 1000000.0
-        self.payment_max_name_length = 100
+        'payment_max_amount': 1000000.0,
+        'payment_max_name_length': 100,
         
         # Performance settings
-        self.http_pool_connections = 10
-        self.http_pool_maxsize = 20
+        'http_pool_connections': 10,
+        'http_pool_maxsize': 20,
+        
+        # Storage settings
+        'transaction_window_size': 100000,  # confirmed transactions kept in memory after compaction
+        
+        # Server settings
+        'server_worker_connections': 2000,  # concurrent connections per gevent server
+        'status_snapshot_interval_ms': 200.0,  # how long a /status body is reused
+        'metrics_snapshot_interval_ms': 1000.0,  # how long a /metrics body is reused
+    })
+    
+    # Known settings and their types; load_from_file coerces to these and
+    # drops anything else
+    _SCHEMA = MappingProxyType({
+        'node_configs': dict,
+        **{key: type(value) for key, value in _DEFAULTS.items()}
+    })
+    
+    def __init__(self, config_file: str = None):
+        # Default configuration (immutable values, so sharing them is safe)
+        self.__dict__.update(self._DEFAULTS)
         
         # Load from file if provided
         if config_file:
             self.load_from_file(config_file)
         
-        # Load from environment variables (overrides file config)
+        # Per-instance copy of the default nodes unless the file supplied its own
+        if 'node_configs' not in self.__dict__:
+            self.node_configs = {node_id: dict(node)
+                                 for node_id, node in self._DEFAULT_NODE_CONFIGS.items()}
+        
+        # Load from environment variables (overrides file config);
+        # this also builds the node URL lookup tables
         self.load_from_env()
     
+    @classmethod
+    def get(cls, config_file: str = None) -> 'Config':
+        """
+        Return a shared Config for config_file, rebuilding it if the file or
+        any of the SYNCPAY_* environment overrides have changed
+        """
+        key = os.path.abspath(config_file) if config_file else None
+        try:
+            mtime = os.stat(config_file).st_mtime_ns if config_file else None
+        except OSError:
+            mtime = None
+        env = os.environ
+        stamp = (mtime, tuple(env.get(env_key) for env_key in _ENV_TABLE))
+        
+        cached = cls._INSTANCES.get(key)
+        if cached is None or cached[1] != stamp:
+            cached = (cls(config_file), stamp)
+            cls._INSTANCES[key] = cached
+        return cached[0]
+    
     def load_from_file(self, file_path: str):
         """Load configuration from JSON file"""
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                self.__dict__.update(data)
+            st = os.stat(file_path)
+            key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+            data = _CONFIG_CACHE.get(key)
+            if data is None:
+                with open(file_path, 'rb') as f:
+                    data = json_codec.loads(f.read())
+                _CONFIG_CACHE[key] = data
+            for name, value in data.items():
+                expected = self._SCHEMA.get(name)
+                if expected is None:
+                    print(f"Warning: Ignoring unknown config key '{name}'")
+                    continue
+                try:
+                    value = _coerce_setting(expected, value)
+                except (ValueError, TypeError):
+                    print(f"Warning: Ignoring invalid value for config key '{name}'")
+                    continue
+                setattr(self, name, value)
+            # On a live config, keep the peer/URL lookups in step with the new nodes
+            if 'node_configs' in data and hasattr(self, '_nodes'):
+                self._index_nodes()
         except FileNotFoundError:
             print(f"Warning: Config file {file_path} not found, using defaults")
-        except json.JSONDecodeError as e:
+        except json_codec.JSONDecodeError as e:
             print(f"Warning: Error parsing config file: {e}, using defaults")
     
     def load_from_env(self):
         """Load configuration from environment variables"""
-        # Node configurations
-        if os.getenv('SYNCPAY_NODE_CONFIGS'):
+        env = os.environ
+        for env_key, (attr, coerce) in _ENV_TABLE.items():
+            raw = env.get(env_key)
+            if not raw:
+                continue
             try:
-                self.node_configs = json.loads(os.getenv('SYNCPAY_NODE_CONFIGS'))
-            except json.JSONDecodeError:
-                pass
-        
-        # Timeouts
-        if os.getenv('SYNCPAY_CONSENSUS_TIMEOUT'):
-            self.consensus_timeout = float(os.getenv('SYNCPAY_CONSENSUS_TIMEOUT'))
-        
-        if os.getenv('SYNCPAY_HEALTH_CHECK_INTERVAL'):
-            self.health_check_interval = float(os.getenv('SYNCPAY_HEALTH_CHECK_INTERVAL'))
+                setattr(self, attr, coerce(raw))
+            except (ValueError, TypeError):
+                print(f"Warning: Ignoring invalid value for {env_key}")
         
-        if os.getenv('SYNCPAY_REPLICATION_TIMEOUT'):
-            self.replication_timeout = float(os.getenv('SYNCPAY_REPLICATION_TIMEOUT'))
+        # Rebuild peer/URL lookups so they always reflect node_configs
+        self._index_nodes()
+    
+    def _index_nodes(self):
+        """Precompute node records, URLs and per-node peer lists from node_configs"""
+        self._nodes = tuple(
+            NodeAddress(node_id, config['host'], config['port'], f"{config['host']}:{config['port']}")
+            for node_id, config in self.node_configs.items()
+        )
+        self._node_urls = {node.node_id: node.url for node in self._nodes}
+        self._all_urls = tuple(node.url for node in self._nodes)
+        self._peer_urls = {
+            node.node_id: tuple(other.url for other in self._nodes if other.node_id != node.node_id)
+            for node in self._nodes
+        }
     
     def get_peers(self, current_node: str) -> List[str]:
         """Get list of peer URLs for a given node"""
-        peers = []
-        for node_id, config in self.node_configs.items():
-            if node_id != current_node:
-                peers.append(f"{config['host']}:{config['port']}")
-        return peers
+        # Unknown nodes (e.g. test harnesses) see every configured node as a peer
+        return list(self._peer_urls.get(current_node, self._all_urls))
     
     def get_node_url(self, node_id: str) -> Optional[str]:
         """Get the URL for a specific node"""
-        if node_id in self.node_configs:
-            config = self.node_configs[node_id]
-            return f"{config['host']}:{config['port']}"
-        return None
+        return self._node_urls.get(node_id)
+    
+    def get_nodes(self) -> tuple:
+        """Get the (node_id, host, port, url) records for all configured nodes"""
+        return self._nodes
     
     def get_all_node_urls(self) -> List[str]:
         """Get URLs for all configured nodes"""
-        return [f"{config['host']}:{config['port']}" 
-                for config in self.node_configs.values()]
+        return list(self._all_urls)
     
     def to_dict(self) -> Dict[str, Any]:
         """Export configuration as dictionary"""
-        return {k: v for k, v in self.__dict__.items() 
-                if not k.startswith('_')}
+        return {k: v for k, v in vars(self).items() if not k.startswith('_')}
     
     def save_to_file(self, file_path: str):
         """Save current configuration to file"""
-        with open(file_path, 'w') as f:
-            json.dump(self.to_dict(), f, indent=2)
+        with open(file_path, 'wb') as f:
+            f.write(json_codec.dumps_pretty(self.to_dict()))
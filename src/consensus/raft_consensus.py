@@ -7,11 +7,18 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import random
-import json
 from enum import Enum
 from typing import Dict, List, Optional, Any, Set
 import logging
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from consensus.raft_log import RaftLog
+from utils import json_codec
+
+try:
+    from models import PaymentTransaction
+except ImportError:
+    PaymentTransaction = None
 
 class RaftState(Enum):
     FOLLOWER = "follower"
@@ -29,7 +36,7 @@ class RaftConsensus:
         self.current_leader = None
 
         # Log management
-        self.log = []  # List of (term, transaction_id) tuples
+        self.log = RaftLog()  # (term, transaction_id) entries, stored column-wise
         self.commit_index = 0
         self.last_applied = 0
 
@@ -37,31 +44,62 @@ class RaftConsensus:
         self.next_index = {}  # peer -> next log index to send
         self.match_index = {}  # peer -> highest log index replicated
 
-        # Election timing
-        self.election_timeout = random.uniform(5.0, 10.0)  # seconds
-        self.heartbeat_interval = 1.0  # seconds
+        # Pipelining: next_index advances when entries are sent, not when they
+        # are acked, so each peer can have a window of RPCs in flight
+        self.max_in_flight = 8
+        self._in_flight = {}  # peer -> BoundedSemaphore, built with the peer list
+
+        # Election timing (seconds, from Config)
+        config = node.config
+        self.election_timeout_min = config.consensus_election_timeout_min
+        self.election_timeout_max = config.consensus_election_timeout_max
+        self.election_timeout = random.uniform(self.election_timeout_min, self.election_timeout_max)
+        self.heartbeat_interval = config.consensus_heartbeat_interval
         self.last_heartbeat = 0
         self.last_election_time = 0
+        self.last_leader_contact = 0  # last append_entries accepted from a leader
+        self.last_contact = {}  # peer -> time of last acknowledged append_entries with entries
+        self._heartbeat_bodies = {}  # peer -> (payload key, encoded empty append_entries)
+        self._heartbeats_in_flight = set()
 
         # Threading
-        # Use re-entrant lock to avoid deadlocks when internal methods
-        # re-acquire the same lock in the same thread
-        self.consensus_lock = threading.RLock()
+        # Plain (non re-entrant) lock: internal helpers that run under it
+        # (_send_heartbeats, _apply_committed_entries, _start_election,
+        # _become_leader) expect the caller to hold it and never re-acquire it
+        self.consensus_lock = threading.Lock()
         self.is_running = False
         self.consensus_thread = None
+        # Set to make the consensus loop re-evaluate its next deadline now
+        self._wake = threading.Event()
+        # Notified whenever the leader advances commit_index
+        self._commit_advanced = threading.Condition(self.consensus_lock)
+
+        # Shared worker pool for peer RPCs (votes, heartbeats, replication),
+        # created on first use and shut down in stop()
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
         # Voting and quorum
         self.votes_received = set()
+        self.pre_votes_received = set()
+        self._pre_vote_term = None  # term the running pre-election is gauging
         self.votes_granted = {}  # term -> set of nodes that voted for us
 
         # Configuration
-        self.consensus_timeout = 2.0  # Reduced from 5.0 for faster response
+        self.consensus_timeout = config.consensus_timeout
+
+        # Whether committed entries are applied against node.transactions
+        # (False for bare nodes such as test doubles); rechecked in start()
+        self._applies_to_state = hasattr(node, 'transactions')
+
+        # Peer list and quorum size, refreshed on start and membership changes
+        self._peers = ()
+        self._required_acks = 1
+        self._refresh_peers()
 
         # HTTP Session for better performance
         self.session = self._create_session()
 
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"Raft-{node.node_id}")
 
     def _create_session(self) -> requests.Session:
@@ -77,9 +115,34 @@ class RaftConsensus:
         
         session.mount("http://", adapter)
         session.mount("https://", adapter)
+        # Bodies are pre-encoded bytes, so set the content type once here
+        session.headers['Content-Type'] = 'application/json'
         
         return session
 
+    def _refresh_peers(self):
+        """Re-read the peer list from config and recompute the quorum size"""
+        self._peers = tuple(self.node.config.get_peers(self.node.node_id))
+        # Majority of the cluster, counting this node
+        self._required_acks = (len(self._peers) + 1) // 2 + 1
+        # Per-peer windows exist up front so the send path is a plain lookup
+        for peer in self._peers:
+            if peer not in self._in_flight:
+                self._in_flight[peer] = threading.BoundedSemaphore(self.max_in_flight)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the RPC worker pool, creating it on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                peers = self._peers
+                # Heartbeats, votes and replication can overlap, each blocking
+                # up to consensus_timeout on a slow peer
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(8, len(peers) * 4),
+                    thread_name_prefix=f"raft-{self.node.node_id}"
+                )
+            return self._executor
+
     def start(self):
         """Start the Raft consensus service"""
         if self.is_running:
@@ -88,9 +151,11 @@ class RaftConsensus:
         self.is_running = True
         self.logger.info("Starting Raft consensus service")
 
+        self._applies_to_state = hasattr(self.node, 'transactions')
+
         # Initialize peer tracking
-        peers = self.node.config.get_peers(self.node.node_id)
-        for peer in peers:
+        self._refresh_peers()
+        for peer in self._peers:
             self.next_index[peer] = len(self.log) + 1
             self.match_index[peer] = 0
 
@@ -106,8 +171,16 @@ class RaftConsensus:
     def stop(self):
         """Stop the Raft consensus service"""
         self.is_running = False
+        self._wake.set()
         if self.consensus_thread:
             self.consensus_thread.join(timeout=5.0)
+
+        # Drop queued RPCs; in-flight ones finish against their timeout
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+        self._heartbeats_in_flight.clear()
         
         # Close session to release connections
         if hasattr(self, 'session'):
@@ -115,94 +188,117 @@ class RaftConsensus:
             
         self.logger.info("Raft consensus service stopped")
 
+    @property
+    def log(self) -> RaftLog:
+        return self._log
+
+    @log.setter
+    def log(self, entries):
+        # Accept any iterable of (term, txn_id) pairs, e.g. a plain list
+        self._log = entries if isinstance(entries, RaftLog) else RaftLog(entries)
+
     def is_leader(self) -> bool:
         """Check if this node is the current leader"""
-        with self.consensus_lock:
-            return self.state == RaftState.LEADER
+        # A single attribute read is atomic, so request threads (including
+        # every rejected write on a follower) never wait on consensus_lock
+        return self.state == RaftState.LEADER
 
     def propose_transaction(self, transaction) -> bool:
         """
         Propose a transaction for consensus
         Returns True if consensus was achieved, False otherwise
         """
+        return self.propose_transaction_batch([transaction])
+
+    def propose_transaction_batch(self, transactions) -> bool:
+        """
+        Propose several transactions in one consensus round
+        Returns True if all of them were committed, False otherwise
+        """
         # Fast path check under lock, but avoid holding the lock during network I/O
         with self.consensus_lock:
             if self.state != RaftState.LEADER:
-                self.logger.debug("Cannot propose transaction: not leader")
+                self.logger.debug("Cannot propose transactions: not leader")
                 return False
 
-            # Add to log locally
-            log_entry = (self.current_term, transaction.id)
-            self.log.append(log_entry)
-            self.logger.info(f"Proposed transaction {transaction.id} in term {self.current_term}")
+            # Add to log locally; committing the last entry commits them all
+            for transaction in transactions:
+                self.log.append((self.current_term, transaction.id))
+            index = len(self.log)
+            if len(transactions) == 1:
+                self.logger.info(f"Proposed transaction {transactions[0].id} in term {self.current_term}")
+            else:
+                self.logger.info(f"Proposed {len(transactions)} transactions in term {self.current_term}")
 
         # Try to replicate to majority (no lock held during network operations)
-        success = self._replicate_to_majority()
+        success = self._replicate_to_majority(index)
 
         if success:
             with self.consensus_lock:
-                # Advance commit index and apply to state machine
-                new_commit_index = len(self.log)
-                if new_commit_index > self.commit_index:
-                    self.commit_index = new_commit_index
-                    # Apply committed entries
-                    self._apply_committed_entries()
+                # Covers clusters with no peers; otherwise acks already advanced it
+                self._advance_commit_index()
         return success
 
-    def _replicate_to_majority(self) -> bool:
-        """Replicate latest log entry to a majority of peers in parallel"""
-        peers = self.node.config.get_peers(self.node.node_id)
+    def _replicate_to_majority(self, index: int = None) -> bool:
+        """
+        Send append_entries to all peers in parallel and wait until log entry
+        index (default: the last one) is committed in the current term
+        """
+        with self.consensus_lock:
+            if index is None:
+                index = len(self.log)
+            term = self.current_term
+
+        peers = self._peers
         if not peers:
             # Single node cluster
             return True
 
-        total_nodes = len(peers) + 1  # +1 for self
-        required_acks = (total_nodes // 2) + 1
-
-        # We count the leader's own log append as one ack
-        acks = 1
-
-        results = []
-        results_lock = threading.Lock()
-        done = threading.Event()
-
-        def replicate_to_peer(peer_url: str):
-            nonlocal acks
-            ok = self._send_append_entries(peer_url)
-            with results_lock:
-                results.append((peer_url, ok))
-                if ok:
-                    acks += 1
-                    if acks >= required_acks:
-                        done.set()
-
-        threads = []
+        executor = self._get_executor()
         for peer in peers:
-            t = threading.Thread(target=replicate_to_peer, args=(peer,), daemon=True)
-            threads.append(t)
-            t.start()
-
-        # Wait up to a bounded time for majority
-        deadline = time.time() + max(1.0, self.consensus_timeout + 0.5)
-        while time.time() < deadline and not done.is_set():
-            time.sleep(0.05)
-
-        # Best-effort join remaining threads briefly (non-blocking beyond deadline)
-        for t in threads:
-            t.join(timeout=0.1)
+            executor.submit(self._send_append_entries, peer)
+
+        # Acks from these RPCs, or from pipelined ones already carrying the
+        # entry, advance commit_index; return as soon as it covers the entry
+        with self._commit_advanced:
+            self._commit_advanced.wait_for(
+                lambda: self.commit_index >= index or self.current_term != term,
+                timeout=max(1.0, self.consensus_timeout + 0.5)
+            )
+            committed = self.current_term == term and self.commit_index >= index
+            commit_index = self.commit_index
 
-        if acks >= required_acks:
-            self.logger.info(f"Consensus achieved: acks={acks}/{total_nodes}")
+        if committed:
+            self.logger.info(f"Consensus achieved: commit_index={commit_index}")
             return True
 
-        self.logger.warning(f"Consensus failed: acks={acks}/{total_nodes} (required={required_acks})")
+        self.logger.warning(f"Consensus failed: entry {index} not committed (commit_index={commit_index})")
         return False
 
+    def _advance_commit_index(self):
+        """Commit up to the highest entry stored on a majority (caller holds consensus_lock)"""
+        # The leader holds every entry, so it needs _required_acks - 1 peers
+        needed = self._required_acks - 1
+        if needed > 0:
+            matched = sorted((self.match_index.get(peer, 0) for peer in self._peers), reverse=True)
+            index = min(matched[needed - 1], len(self.log))
+        else:
+            index = len(self.log)
+
+        # Only entries from the current term are committed by counting replicas;
+        # earlier ones are committed along with them
+        if index > self.commit_index and self.log.terms[index - 1] == self.current_term:
+            self.commit_index = index
+            self._apply_committed_entries()
+            self._commit_advanced.notify_all()
+
     def _consensus_loop(self):
         """Main consensus loop"""
         while self.is_running:
             try:
-                current_time = time.time()
+                # Clear before reading state so a wake-up during the checks isn't lost
+                self._wake.clear()
+                current_time = time.monotonic()
 
                 with self.consensus_lock:
                     if self.state == RaftState.LEADER:
@@ -210,17 +306,22 @@ class RaftConsensus:
                         if current_time - self.last_heartbeat >= self.heartbeat_interval:
                             self._send_heartbeats()
                             self.last_heartbeat = current_time
+                        deadline = self.last_heartbeat + self.heartbeat_interval
 
-                    elif self.state in [RaftState.FOLLOWER, RaftState.CANDIDATE]:
+                    else:
                         # Check for election timeout
                         if current_time - self.last_election_time >= self.election_timeout:
-                            self._start_election()
+                            self._start_pre_election()
+                        # Heartbeats received meanwhile push this out; we just
+                        # wake early, see the new last_election_time and wait again
+                        deadline = self.last_election_time + self.election_timeout
 
-                time.sleep(0.1)  # Small sleep to prevent busy waiting
+                # Sleep until the next heartbeat or election deadline, or a state change
+                self._wake.wait(max(0.0, deadline - time.monotonic()))
 
             except Exception as e:
                 self.logger.error(f"Error in consensus loop: {e}")
-                time.sleep(1.0)
+                self._wake.wait(1.0)
 
     def _start_election(self):
         """Start a leader election"""
@@ -228,21 +329,76 @@ class RaftConsensus:
         self.current_term += 1
         self.voted_for = self.node.node_id
         self.votes_received = {self.node.node_id}
-        self.last_election_time = time.time()
+        self.last_election_time = time.monotonic()
 
         self.logger.info(f"Starting election for term {self.current_term}")
 
         # Reset election timeout for next election
-        self.election_timeout = random.uniform(5.0, 10.0)
+        self.election_timeout = random.uniform(self.election_timeout_min, self.election_timeout_max)
 
         # Request votes from all peers
-        peers = self.node.config.get_peers(self.node.node_id)
-        for peer in peers:
-            threading.Thread(
-                target=self._request_vote,
-                args=(peer,),
-                daemon=True
-            ).start()
+        executor = self._get_executor()
+        for peer in self._peers:
+            executor.submit(self._request_vote, peer)
+
+    def _start_pre_election(self):
+        """
+        Ask peers whether they would vote for us before disrupting the cluster.
+        Unlike _start_election this leaves current_term and voted_for untouched,
+        so a node that merely lost contact can't force everyone into a new term.
+        """
+        self._pre_vote_term = self.current_term + 1
+        self.pre_votes_received = {self.node.node_id}
+        self.last_election_time = time.monotonic()
+        self.election_timeout = random.uniform(self.election_timeout_min, self.election_timeout_max)
+
+        self.logger.info(f"Starting pre-election for term {self._pre_vote_term}")
+
+        if len(self.pre_votes_received) >= self._required_acks:
+            # Single node cluster
+            self._pre_vote_term = None
+            self._start_election()
+            return
+
+        executor = self._get_executor()
+        for peer in self._peers:
+            executor.submit(self._request_pre_vote, peer)
+
+    def _request_pre_vote(self, peer: str):
+        """Request a pre-vote from a peer and start the real election on a majority"""
+        try:
+            with self.consensus_lock:
+                term = self._pre_vote_term
+                if term is None:
+                    return
+                payload = {
+                    'term': term,
+                    'candidate_id': self.node.node_id,
+                    'last_log_index': len(self.log),
+                    'last_log_term': self.log.last_term()
+                }
+
+            response = self.session.post(
+                f"http://{peer}/consensus",
+                data=json_codec.dumps({'type': 'pre_vote', 'data': payload}),
+                timeout=self.consensus_timeout
+            )
+
+            if response.status_code == 200:
+                data = json_codec.loads(response.content)
+                with self.consensus_lock:
+                    # Ignore replies for a pre-election that has finished or been superseded
+                    if not data.get('vote_granted') or self._pre_vote_term != term:
+                        return
+                    if self.state == RaftState.LEADER or self.current_term + 1 != term:
+                        return
+                    self.pre_votes_received.add(peer)
+                    if len(self.pre_votes_received) >= self._required_acks:
+                        self._pre_vote_term = None
+                        self._start_election()
+
+        except Exception as e:
+            self.logger.debug("Failed to request pre-vote from %s: %s", peer, e)
 
     def _request_vote(self, peer: str):
         """Request a vote from a peer"""
@@ -251,31 +407,27 @@ class RaftConsensus:
                 'term': self.current_term,
                 'candidate_id': self.node.node_id,
                 'last_log_index': len(self.log),
-                'last_log_term': self.log[-1][0] if self.log else 0
+                'last_log_term': self.log.last_term()
             }
 
             response = self.session.post(
                 f"http://{peer}/consensus",
-                json={'type': 'request_vote', 'data': payload},
+                data=json_codec.dumps({'type': 'request_vote', 'data': payload}),
                 timeout=self.consensus_timeout
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.loads(response.content)
                 with self.consensus_lock:
                     if data.get('vote_granted') and data.get('term') == self.current_term:
                         self.votes_received.add(peer)
 
                         # Check if we have majority
-                        peers = self.node.config.get_peers(self.node.node_id)
-                        total_nodes = len(peers) + 1
-                        required_votes = (total_nodes // 2) + 1
-
-                        if len(self.votes_received) >= required_votes:
+                        if len(self.votes_received) >= self._required_acks:
                             self._become_leader()
 
         except Exception as e:
-            self.logger.debug(f"Failed to request vote from {peer}: {e}")
+            self.logger.debug("Failed to request vote from %s: %s", peer, e)
 
     def _become_leader(self):
         """Transition to leader state"""
@@ -284,42 +436,44 @@ class RaftConsensus:
 
         self.state = RaftState.LEADER
         self.current_leader = self.node.node_id
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = time.monotonic()
+        # The loop is sleeping toward an election deadline; switch it to heartbeats
+        self._wake.set()
 
         # Initialize leader state
-        peers = self.node.config.get_peers(self.node.node_id)
-        for peer in peers:
+        for peer in self._peers:
             self.next_index[peer] = len(self.log) + 1
             self.match_index[peer] = 0
 
         self.logger.info(f"Became leader for term {self.current_term}")
 
     def _send_heartbeats(self):
-        """Send heartbeat messages to all followers"""
-        peers = self.node.config.get_peers(self.node.node_id)
-
-        for peer in peers:
-            threading.Thread(
-                target=self._send_append_entries,
-                args=(peer,),
-                daemon=True
-            ).start()
-
-        # On heartbeat, also apply any newly committed entries
-        with self.consensus_lock:
-            self._apply_committed_entries()
+        """Send heartbeat messages to all followers (caller holds consensus_lock)"""
+        executor = self._get_executor()
+        now = time.monotonic()
+        for peer in self._peers:
+            # A recent append_entries already reset the follower's election timer,
+            # and a peer still working on the last heartbeat doesn't need another
+            if now - self.last_contact.get(peer, 0) < self.heartbeat_interval:
+                continue
+            if peer in self._heartbeats_in_flight:
+                continue
+            self._heartbeats_in_flight.add(peer)
+            executor.submit(self._send_heartbeat, peer)
 
-    def _apply_committed_entries(self):
-        """Apply committed log entries to the state machine (store transactions)."""
+    def _send_heartbeat(self, peer: str):
+        """Send one heartbeat to a peer and clear its in-flight marker"""
         try:
-            # Import here to avoid circular dependency
-            from models import PaymentTransaction
-        except Exception:
-            PaymentTransaction = None
+            self._send_append_entries(peer)
+        finally:
+            with self.consensus_lock:
+                self._heartbeats_in_flight.discard(peer)
 
+    def _apply_committed_entries(self):
+        """Apply committed log entries to the state machine (caller holds consensus_lock)."""
         # If node does not manage transactions (e.g., in unit tests with mocks),
         # simply advance last_applied to commit_index without touching node state.
-        if not hasattr(self.node, 'transactions'):
+        if not self._applies_to_state:
             self.last_applied = self.commit_index
             return
 
@@ -337,49 +491,107 @@ class RaftConsensus:
 
     def _send_append_entries(self, peer: str) -> bool:
         """Send append entries RPC to a peer"""
+        window = self._in_flight.get(peer)
+        if window is None:
+            window = self._in_flight.setdefault(peer, threading.BoundedSemaphore(self.max_in_flight))
+        if not window.acquire(timeout=self.consensus_timeout):
+            self.logger.debug("Append entries window to %s is full", peer)
+            return False
+
         try:
+            # Snapshot everything the request needs in one short critical section
             with self.consensus_lock:
-                prev_log_index = self.next_index[peer] - 1
-                prev_log_term = self.log[prev_log_index - 1][0] if prev_log_index > 0 else 0
+                next_index = self.next_index.get(peer)
+                if next_index is None:
+                    return False
+                term = self.current_term
+                leader_commit = self.commit_index
+                prev_log_index = next_index - 1
+                prev_log_term = self.log.terms[prev_log_index - 1] if prev_log_index > 0 else 0
 
                 # Get entries to send
                 entries = []
-                if self.next_index[peer] <= len(self.log):
-                    entries = self.log[self.next_index[peer] - 1:]
+                if next_index <= len(self.log):
+                    entries = self.log.entries_from(prev_log_index)
+                    # Pipeline: the next RPC to this peer carries only newer entries
+                    self.next_index[peer] = next_index + len(entries)
+
+            # Encode and send without holding the lock
+            body = self._encode_append_entries(
+                peer, term, prev_log_index, prev_log_term, entries, leader_commit
+            )
+            data = None
+            try:
+                response = self.session.post(
+                    f"http://{peer}/consensus",
+                    data=body,
+                    timeout=self.consensus_timeout
+                )
+                if response.status_code == 200:
+                    data = json_codec.loads(response.content)
+            except Exception as e:
+                self.logger.debug("Failed to send append entries to %s: %s", peer, e)
 
-            payload = {
-                'term': self.current_term,
+            # Merge the outcome in a single acquire
+            with self.consensus_lock:
+                if self.current_term != term:
+                    # Term changed while in flight; leader state was reset since
+                    return False
+
+                if data is None:
+                    # Transport error or bad status: resend these entries next time
+                    self._rewind_next_index(peer, prev_log_index + 1)
+                    return False
+
+                if entries:
+                    # Lets the next heartbeat tick skip this peer. Empty heartbeats
+                    # don't count, or each one would suppress the one after it.
+                    self.last_contact[peer] = time.monotonic()
+                if data.get('success'):
+                    # Acks can arrive out of order; never move match_index back
+                    if entries:
+                        self.match_index[peer] = max(self.match_index.get(peer, 0),
+                                                     prev_log_index + len(entries))
+                        if self.state == RaftState.LEADER:
+                            self._advance_commit_index()
+                    return True
+
+                # Log inconsistency: resend from before this RPC's prev entry
+                self._rewind_next_index(peer, prev_log_index)
+                return False
+
+        finally:
+            window.release()
+
+    def _encode_append_entries(self, peer: str, term: int, prev_log_index: int,
+                               prev_log_term: int, entries: list, leader_commit: int) -> bytes:
+        """Encode an append_entries request, reusing the last body for repeat heartbeats"""
+        key = (term, prev_log_index, prev_log_term, leader_commit)
+        if not entries:
+            # An idle leader sends the same heartbeat to a peer until one of these changes
+            cached = self._heartbeat_bodies.get(peer)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+        body = json_codec.dumps({
+            'type': 'append_entries',
+            'data': {
+                'term': term,
                 'leader_id': self.node.node_id,
                 'prev_log_index': prev_log_index,
                 'prev_log_term': prev_log_term,
                 'entries': entries,
-                'leader_commit': self.commit_index
+                'leader_commit': leader_commit
             }
+        })
+        if not entries:
+            self._heartbeat_bodies[peer] = (key, body)
+        return body
 
-            response = self.session.post(
-                f"http://{peer}/consensus",
-                json={'type': 'append_entries', 'data': payload},
-                timeout=self.consensus_timeout
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                with self.consensus_lock:
-                    if data.get('success'):
-                        # Update match index
-                        if entries:
-                            self.match_index[peer] = prev_log_index + len(entries)
-                            self.next_index[peer] = self.match_index[peer] + 1
-                        return True
-                    else:
-                        # Log inconsistency, decrement next_index
-                        self.next_index[peer] = max(1, self.next_index[peer] - 1)
-
-            return False
-
-        except Exception as e:
-            self.logger.debug(f"Failed to send append entries to {peer}: {e}")
-            return False
+    def _rewind_next_index(self, peer: str, index: int):
+        """Move a peer's next_index back to index, but not below its acked entries"""
+        floor = self.match_index.get(peer, 0) + 1
+        self.next_index[peer] = max(1, floor, min(self.next_index[peer], index))
 
     def handle_consensus_request(self, request) -> tuple[Dict[str, Any], int]:
         """
@@ -397,6 +609,8 @@ class RaftConsensus:
 
             if request_type == 'request_vote':
                 return self._handle_request_vote(request_data)
+            elif request_type == 'pre_vote':
+                return self._handle_pre_vote(request_data)
             elif request_type == 'append_entries':
                 return self._handle_append_entries(request_data)
             else:
@@ -429,7 +643,29 @@ class RaftConsensus:
 
             if grant_vote:
                 self.voted_for = candidate_id
-                self.last_election_time = time.time()
+                self.last_election_time = time.monotonic()
+
+            return {
+                "term": self.current_term,
+                "vote_granted": grant_vote
+            }, 200
+
+    def _handle_pre_vote(self, data: Dict) -> tuple[Dict[str, Any], int]:
+        """Handle a pre-vote RPC; answers like request_vote but changes no state"""
+        candidate_term = data.get('term', 0)
+
+        with self.consensus_lock:
+            # Refuse while we have a live leader (or are it): the candidate is
+            # the one that lost contact, and an election would only disrupt
+            leader_alive = (
+                self.state == RaftState.LEADER or
+                time.monotonic() - self.last_leader_contact < self.election_timeout_min
+            )
+            grant_vote = (
+                candidate_term > self.current_term and
+                not leader_alive and
+                self._is_log_up_to_date(data)
+            )
 
             return {
                 "term": self.current_term,
@@ -453,7 +689,8 @@ class RaftConsensus:
                 self.voted_for = None
 
             self.current_leader = leader_id
-            self.last_election_time = time.time()
+            self.last_election_time = time.monotonic()
+            self.last_leader_contact = self.last_election_time
 
             # Check log consistency
             prev_log_index = data.get('prev_log_index', 0)
@@ -467,13 +704,24 @@ class RaftConsensus:
             leader_commit = data.get('leader_commit', 0)
 
             if entries:
-                # Remove conflicting entries and append new ones
-                self.log = self.log[:prev_log_index]
-                self.log.extend(entries)
-
-            # Update commit index
+                # Truncate only on a real conflict, so a delayed RPC carrying an
+                # older prefix can't drop entries a later RPC already appended
+                for offset, entry in enumerate(entries):
+                    index = prev_log_index + offset
+                    if index >= len(self.log):
+                        self.log.extend(entries[offset:])
+                        break
+                    if self.log.terms[index] != entry[0]:
+                        del self.log[index:]
+                        self.log.extend(entries[offset:])
+                        break
+
+            # Update commit index, applying whatever it newly covers
             if leader_commit > self.commit_index:
-                self.commit_index = min(leader_commit, len(self.log))
+                new_commit_index = min(leader_commit, len(self.log))
+                if new_commit_index > self.commit_index:
+                    self.commit_index = new_commit_index
+                    self._apply_committed_entries()
 
             return {"term": self.current_term, "success": True}, 200
 
@@ -482,7 +730,7 @@ class RaftConsensus:
         candidate_last_log_index = candidate_data.get('last_log_index', 0)
         candidate_last_log_term = candidate_data.get('last_log_term', 0)
 
-        our_last_log_term = self.log[-1][0] if self.log else 0
+        our_last_log_term = self.log.last_term()
         our_last_log_index = len(self.log)
 
         # Log is up-to-date if:
@@ -502,7 +750,7 @@ class RaftConsensus:
         if prev_log_index > len(self.log):
             return False
 
-        return self.log[prev_log_index - 1][0] == prev_log_term
+        return self.log.terms[prev_log_index - 1] == prev_log_term
 
     def trigger_leader_election(self):
         """Manually trigger a leader election"""
@@ -511,10 +759,22 @@ class RaftConsensus:
                 self.logger.info("Manually triggering leader election")
                 self._start_election()
 
+    def step_down(self):
+        """Give up leadership (e.g. when this node can no longer be trusted to lead)"""
+        with self.consensus_lock:
+            if self.state == RaftState.LEADER:
+                self.logger.warning(f"Stepping down as leader in term {self.current_term}")
+                self.state = RaftState.FOLLOWER
+                self.current_leader = None
+                # Wait out a full election timeout before standing again
+                self.last_election_time = time.monotonic()
+                self._wake.set()
+
     def handle_peer_failure(self, peer_url: str):
         """Handle peer failure"""
         with self.consensus_lock:
             self.logger.warning(f"Handling peer failure: {peer_url}")
+            self._refresh_peers()
 
             # If the failed peer was the leader, trigger election
             if self.current_leader == peer_url:
@@ -526,6 +786,7 @@ class RaftConsensus:
         """Handle peer recovery"""
         with self.consensus_lock:
             self.logger.info(f"Handling peer recovery: {peer_url}")
+            self._refresh_peers()
 
             # Reinitialize peer tracking
             if peer_url not in self.next_index:
@@ -538,10 +799,10 @@ class RaftConsensus:
             return {
                 'state': self.state.value,
                 'current_term': self.current_term,
-                'is_leader': self.is_leader(),
+                'is_leader': self.state == RaftState.LEADER,
                 'current_leader': self.current_leader,
                 'log_length': len(self.log),
                 'commit_index': self.commit_index,
                 'last_applied': self.last_applied,
-                'peer_count': len(self.node.config.get_peers(self.node.node_id))
+                'peer_count': len(self._peers)
             }
\ No newline at end of file
@@ -0,0 +1,72 @@
+# src/consensus/raft_log.py
+# Column-oriented storage for the Raft log
+
+from array import array
+from typing import Iterable, List, Tuple
+
+
+class RaftLog:
+    """
+    Raft log of (term, transaction_id) entries stored as two columns:
+    terms in a C int64 array and transaction ids in a list.
+    Behaves like the list of tuples it replaces (len, indexing, slicing,
+    append/extend, del of a tail, equality with a list).
+    """
+
+    __slots__ = ('terms', 'txn_ids')
+
+    def __init__(self, entries: Iterable = ()):
+        self.terms = array('q')
+        self.txn_ids: List[str] = []
+        self.extend(entries)
+
+    def append(self, entry):
+        term, txn_id = entry
+        self.terms.append(term)
+        self.txn_ids.append(txn_id)
+
+    def extend(self, entries: Iterable):
+        for term, txn_id in entries:
+            self.terms.append(term)
+            self.txn_ids.append(txn_id)
+
+    def clear(self):
+        del self.terms[:]
+        self.txn_ids.clear()
+
+    def last_term(self) -> int:
+        """Term of the last entry, or 0 for an empty log"""
+        return self.terms[-1] if self.terms else 0
+
+    def entries_from(self, start: int) -> List[Tuple[int, str]]:
+        """Entries from 0-based position start to the end, as (term, txn_id) tuples"""
+        return list(zip(self.terms[start:], self.txn_ids[start:]))
+
+    def __len__(self) -> int:
+        return len(self.txn_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(self.terms[index], self.txn_ids[index]))
+        return (self.terms[index], self.txn_ids[index])
+
+    def __delitem__(self, index):
+        del self.terms[index]
+        del self.txn_ids[index]
+
+    def __iter__(self):
+        return zip(self.terms, self.txn_ids)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, RaftLog):
+            return self.terms == other.terms and self.txn_ids == other.txn_ids
+        try:
+            return len(self) == len(other) and all(
+                term == entry[0] and txn_id == entry[1]
+                for term, txn_id, entry in zip(self.terms, self.txn_ids, other)
+            )
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"RaftLog({list(self)!r})"
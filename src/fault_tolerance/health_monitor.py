@@ -2,6 +2,7 @@
 # Member 1: Fault Tolerance Component
 
 import time
+import heapq
 import threading
 import requests
 from requests.adapters import HTTPAdapter
@@ -9,6 +10,7 @@ from urllib3.util.retry import Retry
 from typing import Dict, List
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 class HealthMonitor:
     def __init__(self, node):
@@ -16,14 +18,24 @@ class HealthMonitor:
         self.peer_status = {}  # Track peer health status
         self.health_check_interval = 10  # seconds
         self.failure_threshold = 3  # consecutive failures before marking as down
+        # (connect, read) seconds: a dead host fails fast, a slow one still gets time
+        self.check_timeout = (1.0, 4.0)
+        self.max_backoff_interval = 60  # seconds between probes of a peer that is down
+        self.next_check_at = {}  # peer -> time its next probe is due
+        
+        # Min-heap of (response_time, version, peer) for get_best_peer_for_request;
+        # entries whose version is stale are discarded lazily when they surface
+        self._response_heap = []
+        self._peer_version = {}
+        self._heap_lock = threading.Lock()
         self.is_running = False
         self.monitor_thread = None
+        self._executor = None  # Probes peers concurrently while running
+        self._stop_event = threading.Event()  # Interrupts the wait between rounds
         
         # HTTP Session for better performance
         self.session = self._create_session()
         
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"HealthMonitor-{node.node_id}")
     
     def _create_session(self) -> requests.Session:
@@ -48,6 +60,7 @@ class HealthMonitor:
             return
             
         self.is_running = True
+        self._stop_event.clear()
         self.logger.info("Starting health monitoring service")
         
         # Initialize peer status
@@ -56,11 +69,17 @@ class HealthMonitor:
             self.peer_status[peer] = {
                 'is_healthy': True,
                 'consecutive_failures': 0,
-                'last_check': time.time(),
-                'last_successful_check': time.time(),
+                'last_check': time.monotonic(),
+                'last_successful_check': time.monotonic(),
                 'response_time': 0.0
             }
         
+        # One worker per peer so a dead peer's timeout doesn't delay the others
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(peers)),
+            thread_name_prefix=f"health-{self.node.node_id}"
+        )
+        
         # Start monitoring thread
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
@@ -68,9 +87,14 @@ class HealthMonitor:
     def stop(self):
         """Stop health monitoring service"""
         self.is_running = False
+        self._stop_event.set()
         if self.monitor_thread:
             self.monitor_thread.join()
         
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        
         # Close session to release connections
         if hasattr(self, 'session'):
             self.session.close()
@@ -82,29 +106,57 @@ class HealthMonitor:
         while self.is_running:
             try:
                 self._check_all_peers()
-                time.sleep(self.health_check_interval)
+                self._stop_event.wait(self._time_until_next_check())
             except Exception as e:
                 self.logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(5)  # Shorter sleep on error
+                self._stop_event.wait(5)  # Shorter sleep on error
     
     def _check_all_peers(self):
-        """Check health of all peer nodes"""
-        for peer_url in self.peer_status.keys():
-            self._check_peer_health(peer_url)
+        """Check health of all peer nodes that are due for a probe"""
+        now = time.monotonic()
+        peers = [peer for peer in self.peer_status if self.next_check_at.get(peer, 0) <= now]
+        if self._executor is None:
+            for peer_url in peers:
+                self._check_peer_health(peer_url)
+        else:
+            # A round takes as long as the slowest peer rather than the sum of all
+            for _ in self._executor.map(self._check_peer_health, peers):
+                pass
+        
+        now = time.monotonic()
+        for peer_url in peers:
+            self.next_check_at[peer_url] = now + self._check_interval_for(peer_url)
+    
+    def _check_interval_for(self, peer_url) -> float:
+        """Probe interval for a peer: the normal interval, backing off once it is down"""
+        status = self.peer_status[peer_url]
+        if status['is_healthy']:
+            return self.health_check_interval
+        
+        # Doubles with each failure past the threshold, so dead peers cost
+        # little while healthy ones stay on the normal interval
+        excess = status['consecutive_failures'] - self.failure_threshold
+        return min(self.max_backoff_interval, self.health_check_interval * 2 ** max(0, excess))
+    
+    def _time_until_next_check(self) -> float:
+        """Seconds until the earliest peer probe is due"""
+        if not self.next_check_at:
+            return self.health_check_interval
+        return max(0.0, min(self.next_check_at.values()) - time.monotonic())
     
     def _check_peer_health(self, peer_url):
         """Check health of a specific peer"""
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
-            # Send health check request
+            # Probe /ping: peers answer it with a constant body ahead of
+            # routing, and /health reports nothing more about liveness
             response = self.session.get(
-                f"http://{peer_url}/health",
-                timeout=5,
-                headers={'Content-Type': 'application/json'}
+                f"http://{peer_url}/ping",
+                timeout=self.check_timeout
             )
             
-            response_time = time.time() - start_time
+            response_time = time.monotonic() - start_time
             
             if response.status_code == 200:
                 # Peer is healthy
@@ -131,15 +183,24 @@ class HealthMonitor:
         peer_status = self.peer_status[peer_url]
         peer_status['is_healthy'] = True
         peer_status['consecutive_failures'] = 0
-        peer_status['last_check'] = time.time()
-        peer_status['last_successful_check'] = time.time()
+        peer_status['last_check'] = time.monotonic()
+        peer_status['last_successful_check'] = time.monotonic()
         peer_status['response_time'] = response_time
+        
+        with self._heap_lock:
+            version = self._peer_version.get(peer_url, 0) + 1
+            self._peer_version[peer_url] = version
+            heapq.heappush(self._response_heap, (response_time, version, peer_url))
+            # Stale entries below the top are only dropped when they surface;
+            # compact once they clearly outnumber the live ones
+            if len(self._response_heap) > 4 * len(self.peer_status) + 8:
+                self._seed_response_heap()
     
     def _mark_peer_unhealthy(self, peer_url, error_reason):
         """Mark peer as potentially unhealthy"""
         peer_status = self.peer_status[peer_url]
         peer_status['consecutive_failures'] += 1
-        peer_status['last_check'] = time.time()
+        peer_status['last_check'] = time.monotonic()
         
         # Only mark as unhealthy after threshold failures
         if peer_status['consecutive_failures'] >= self.failure_threshold:
@@ -150,7 +211,7 @@ class HealthMonitor:
                 self._handle_peer_failure(peer_url)
             
         else:
-            self.logger.debug(f"Peer {peer_url} check failed ({peer_status['consecutive_failures']}/{self.failure_threshold}): {error_reason}")
+            self.logger.debug("Peer %s check failed (%s/%s): %s", peer_url, peer_status['consecutive_failures'], self.failure_threshold, error_reason)
     
     def handle_peer_failure(self, peer_url):
         """Public method to handle peer failure (for testing and external triggers)"""
@@ -229,7 +290,7 @@ class HealthMonitor:
             status_summary[peer] = {
                 'healthy': status['is_healthy'],
                 'consecutive_failures': status['consecutive_failures'],
-                'last_check_ago': time.time() - status['last_check'],
+                'last_check_ago': time.monotonic() - status['last_check'],
                 'response_time_ms': status['response_time'] * 1000
             }
         return status_summary
@@ -244,15 +305,31 @@ class HealthMonitor:
     
     def get_best_peer_for_request(self) -> str:
         """Get the healthiest peer for routing requests"""
-        healthy_peers = self.get_healthy_peers()
-        
-        if not healthy_peers:
-            return None
-        
-        # Choose peer with lowest response time
-        best_peer = min(
-            healthy_peers,
-            key=lambda peer: self.peer_status[peer]['response_time']
-        )
-        
-        return best_peer
+        with self._heap_lock:
+            heap = self._response_heap
+            while True:
+                if not heap:
+                    # Peers marked healthy outside _mark_peer_healthy (e.g. at
+                    # start) have no heap entry yet; seed it from peer_status
+                    if not self._seed_response_heap():
+                        return None
+                
+                # Choose peer with lowest response time
+                response_time, version, peer = heap[0]
+                status = self.peer_status.get(peer)
+                if (status is not None and status['is_healthy']
+                        and self._peer_version.get(peer, 0) == version):
+                    return peer
+                heapq.heappop(heap)
+    
+    def _seed_response_heap(self) -> bool:
+        """Rebuild the response-time heap from healthy peers (caller holds _heap_lock)"""
+        entries = []
+        for peer, status in self.peer_status.items():
+            if status['is_healthy']:
+                version = self._peer_version.get(peer, 0) + 1
+                self._peer_version[peer] = version
+                entries.append((status['response_time'], version, peer))
+        heapq.heapify(entries)
+        self._response_heap[:] = entries
+        return bool(entries)
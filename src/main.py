@@ -1,25 +1,58 @@
+import sys
+
+# gevent has to patch the stdlib before anything else imports it, so that
+# threading, queue, time.sleep and requests all yield instead of blocking.
+# Only done when run as a script; gunicorn's gevent worker patches on its own.
+if __name__ == "__main__" and '--dev' not in sys.argv:
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
 from flask import Flask, request, jsonify
 import time
-import uuid
 import threading
-import sys
 import os
 import logging
-from logging.handlers import RotatingFileHandler
-from models import PaymentTransaction, NodeInfo
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import Empty, Full, Queue, SimpleQueue
+from models import (PaymentTransaction, NodeInfo, PaymentValidationError, validate_payment,
+                    insert_by_timestamp, transactions_since, transactions_digest)
 from config import Config
 from utils.metrics import MetricsCollector
+from utils import json_codec
+from utils.json_provider import CodecJSONProvider
 
 # Import component modules (each member implements their part)
 from fault_tolerance.health_monitor import HealthMonitor
 from replication.replicator import PaymentReplicator  
+from replication.deduplication import DeduplicationManager
 from time_sync.time_synchronizer import TimeSynchronizer
 from consensus.raft_consensus import RaftConsensus
 
+# Production WSGI server (optional); falls back to Werkzeug's threaded server
+try:
+    from gevent.pywsgi import WSGIServer
+except ImportError:
+    WSGIServer = None
+
+# Background writer for the active log file; replaced when logging is reconfigured
+_log_listener = None
+
+def _stop_log_listener():
+    """Drain queued log records and stop the background writer, if any"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
 class SyncPayNode:
     def __init__(self, node_id: str, config_file: str = None):
         self.node_id = node_id
-        self.config = Config(config_file)
+        self.config = Config.get(config_file)
         self.node_config = self.config.node_configs[node_id]
         self._setup_logging()
         
@@ -28,12 +61,45 @@ class SyncPayNode:
         
         # Initialize Flask app
         self.app = Flask(__name__)
+        self.app.json = CodecJSONProvider(self.app)
         
         # Storage for transactions (in-memory for demo)
         self.transactions = {}
-        self.transaction_log = []
+        self.transaction_log = []  # Same transactions, kept ordered by timestamp
         self._transaction_lock = threading.Lock()  # Thread-safe access to transactions
         
+        # Once the log holds two windows of transactions, the older ones are
+        # appended to an on-disk snapshot file and dropped from memory; the
+        # index holds each snapshot's (offset, length) in that file
+        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+        self._snapshot_path = os.path.join(base_dir, 'snapshots', f"{node_id}.jsonl")
+        self._snapshot_index = []
+        self._snapshot_lock = threading.Lock()  # Serializes compactions; taken before _transaction_lock
+        
+        # Queues of /transactions/stream clients; each newly stored
+        # transaction's encoded JSON is pushed to all of them
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self.stream_queue_size = 1000
+        
+        # (payload, Future) per recent Idempotency-Key header, claimed before
+        # consensus; the Future resolves to the response that retries get back,
+        # so they never start another consensus round (LRU-bounded)
+        self._idempotent_responses = OrderedDict()
+        self._idempotent_lock = threading.Lock()
+        self.idempotency_cache_size = 65536
+        
+        # Encoded read-endpoint bodies: the full /transactions listing keyed
+        # on the log's state, and /status rebuilt at most once per interval
+        self._transactions_body = None  # (log key, bytes)
+        self._status_body = None  # (monotonic build time, bytes)
+        self._metrics_bodies = {}  # /metrics format -> (monotonic build time, bytes)
+        
+        # Consecutive payments whose synchronized timestamp was too far from
+        # the local clock; enough of them in a row fence this node off
+        self._skew_strikes = 0
+        self.max_skew_strikes = 3
+        
         # Initialize metrics collector
         self.metrics = MetricsCollector(node_id)
         
@@ -43,12 +109,20 @@ class SyncPayNode:
         self.time_sync = TimeSynchronizer(self)        # Member 3
         self.consensus = RaftConsensus(self)           # Member 4
         
+        # Payments waiting for consensus. One proposer thread takes everything
+        # queued (up to max_proposal_batch) into a single consensus round, and
+        # each request waits on its own Future so it can give up on a slow round
+        self._proposal_queue = Queue(maxsize=4096)
+        self.max_proposal_batch = 128
+        self._proposer_thread = None
+        self._proposer_lock = threading.Lock()
+        
         # Initialize deduplication manager (optional component)
-        from replication.deduplication import DeduplicationManager
         self.deduplication_manager = DeduplicationManager(self)
         
         # Setup routes
         self.setup_routes()
+        self._install_ping_fast_path()
 
     def _setup_logging(self):
         """Configure logging to file to avoid blocking stdout/stderr pipes"""
@@ -61,15 +135,23 @@ class SyncPayNode:
             log_path = os.path.join(logs_dir, f"{self.node_id}.log")
 
             # Reset root handlers to avoid duplicate logs
+            global _log_listener
             root_logger = logging.getLogger()
             for h in list(root_logger.handlers):
                 root_logger.removeHandler(h)
+            _stop_log_listener()
 
             handler = RotatingFileHandler(log_path, maxBytes=1_000_000, backupCount=3)
             formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
             handler.setFormatter(formatter)
 
-            root_logger.addHandler(handler)
+            # Log calls only enqueue the record; a listener thread formats and
+            # writes it, so request threads never wait on the file
+            log_queue = SimpleQueue()
+            _log_listener = QueueListener(log_queue, handler, respect_handler_level=True)
+            _log_listener.start()
+
+            root_logger.addHandler(QueueHandler(log_queue))
             root_logger.setLevel(logging.INFO)
 
             # Reduce noisy loggers
@@ -86,120 +168,88 @@ class SyncPayNode:
             self.metrics.increment('payment_requests_total')
             
             try:
-                data = request.json
-                
                 # Validate input
-                if not data:
-                    self.metrics.increment('payment_errors_validation')
-                    return jsonify({"error": "Request body is required"}), 400
-                
-                if not all(k in data for k in ['amount', 'sender', 'receiver']):
-                    self.metrics.increment('payment_errors_validation')
-                    return jsonify({"error": "Missing required fields: amount, sender, receiver"}), 400
-                
-                # Validate amount
-                try:
-                    amount = float(data['amount'])
-                    if amount <= 0:
-                        return jsonify({"error": "Amount must be positive"}), 400
-                    if amount > self.config.payment_max_amount:
-                        return jsonify({"error": f"Amount exceeds maximum limit of {self.config.payment_max_amount}"}), 400
-                except (ValueError, TypeError):
-                    return jsonify({"error": "Invalid amount format"}), 400
-                
-                # Validate sender and receiver
-                sender = str(data['sender']).strip()
-                receiver = str(data['receiver']).strip()
-                
-                if not sender or not receiver:
-                    return jsonify({"error": "Sender and receiver cannot be empty"}), 400
-                
-                if sender == receiver:
-                    return jsonify({"error": "Sender and receiver cannot be the same"}), 400
-                
-                if len(sender) > self.config.payment_max_name_length or len(receiver) > self.config.payment_max_name_length:
-                    return jsonify({"error": f"Sender/receiver names too long (max {self.config.payment_max_name_length} chars)"}), 400
-                
-                # Check if this node can process payments
-                if not self.consensus.is_leader():
-                    self.metrics.increment('payment_errors_not_leader')
-                    return jsonify({
-                        "error": "Not leader - cannot process payments",
-                        "leader": self.consensus.current_leader
-                    }), 503
-                
-                # Create transaction with synchronized timestamp
-                transaction = PaymentTransaction.create(
-                    amount=amount,
-                    sender=sender,
-                    receiver=receiver, 
-                    node_id=self.node_id
+                amount, sender, receiver = validate_payment(
+                    request.get_json(silent=True),
+                    self.config.payment_max_amount,
+                    self.config.payment_max_name_length
                 )
                 
-                # Apply time synchronization (Member 3)
-                transaction.timestamp = self.time_sync.get_synchronized_time()
-                
-                # Try to achieve consensus with timeout (Member 4)
-                import threading
-                import queue
-                
-                consensus_result = queue.Queue()
+                # A retried request gets the original response back. The key is
+                # claimed before proposing, so a retry that arrives while the
+                # original is still in consensus waits for it instead of paying twice
+                payload = (amount, sender, receiver)
+                idempotency_key = request.headers.get('Idempotency-Key')
+                reservation = None
+                if idempotency_key:
+                    reserved_payload, marker, owner = self._reserve_idempotency_key(idempotency_key, payload)
+                    if not owner:
+                        self.metrics.stop_timer(timer_id)
+                        return self._idempotent_replay(reserved_payload, payload, marker)
+                    reservation = marker
                 
-                def try_consensus():
+                try:
+                    # Check if this node can process payments
+                    if not self.consensus.is_leader():
+                        self.metrics.increment('payment_errors_not_leader')
+                        return jsonify({
+                            "error": "Not leader - cannot process payments",
+                            "leader": self.consensus.current_leader
+                        }), 503
+                    
+                    # Create transaction with synchronized timestamp
+                    transaction = PaymentTransaction.create(
+                        amount=amount,
+                        sender=sender,
+                        receiver=receiver, 
+                        node_id=self.node_id
+                    )
+                    
+                    # Apply time synchronization (Member 3), refusing timestamps
+                    # that would corrupt the ordering of the log
+                    timestamp = self.time_sync.get_synchronized_time()
+                    if not self._timestamp_in_bounds(timestamp):
+                        self.metrics.increment('payment_errors_clock_skew')
+                        self.metrics.stop_timer(timer_id)
+                        return jsonify({"error": "Clock skew exceeds limit"}), 503
+                    transaction.timestamp = timestamp
+                    
+                    # Try to achieve consensus with timeout (Member 4)
+                    future = self._submit_proposal(transaction)
+                    if future is None:
+                        self.metrics.increment('payment_errors_overloaded')
+                        return jsonify({"error": "Too many payments awaiting consensus"}), 503
                     try:
-                        result = self.consensus.propose_transaction(transaction)
-                        consensus_result.put(('success', result))
+                        result = future.result(timeout=self._payment_timeout())
+                    except FuturesTimeout:
+                        if not future.cancel():
+                            # Already being proposed and may still commit: finish it
+                            # then, and keep the key claimed until the outcome is known
+                            future.add_done_callback(
+                                lambda f, marker=reservation:
+                                    self._finish_late_payment(transaction, f, idempotency_key, marker))
+                            reservation = None
+                        return jsonify({"error": "Consensus timeout"}), 504
                     except Exception as e:
-                        consensus_result.put(('error', str(e)))
-                
-                # Run consensus in a separate thread with timeout
-                consensus_thread = threading.Thread(target=try_consensus)
-                consensus_thread.daemon = True
-                consensus_thread.start()
-                consensus_thread.join(timeout=5.0)  # Allow more time for consensus
-                
-                if consensus_thread.is_alive():
-                    return jsonify({"error": "Consensus timeout"}), 504
-                
-                try:
-                    result_type, result = consensus_result.get_nowait()
-                    if result_type == 'error':
-                        return jsonify({"error": f"Consensus error: {result}"}), 500
-                    elif not result:
+                        return jsonify({"error": f"Consensus error: {e}"}), 500
+                    
+                    if not result:
                         return jsonify({"error": "Consensus failed"}), 500
-                except queue.Empty:
-                    return jsonify({"error": "Consensus timeout"}), 504
-                
-                # Store transaction locally
-                with self._transaction_lock:
-                    self.transactions[transaction.id] = transaction
-                    self.transaction_log.append(transaction)
-                
-                # Replicate to other nodes (Member 2) - don't wait for this
-                threading.Thread(
-                    target=self.replicator.replicate_transaction, 
-                    args=(transaction,), 
-                    daemon=True
-                ).start()
-                
-                # Mark as confirmed
-                transaction.status = "confirmed"
-                
-                # Record success metrics
-                self.metrics.increment('payment_success')
-                self.metrics.record_value('payment_amount', amount)
-                duration = self.metrics.stop_timer(timer_id)
-                
-                return jsonify({
-                    "status": "success",
-                    "transaction_id": transaction.id,
-                    "timestamp": transaction.timestamp,
-                    "amount": amount,
-                    "sender": sender,
-                    "receiver": receiver,
-                    "processed_by": self.node_id
-                })
+                    
+                    response_body = self._commit_payment(transaction)
+                    self.metrics.stop_timer(timer_id)
+                    if reservation is not None:
+                        self._complete_idempotency_key(idempotency_key, reservation, response_body)
+                    return jsonify(response_body)
+                finally:
+                    # Any response other than success releases the key for a retry
+                    if reservation is not None and not reservation.done():
+                        self._complete_idempotency_key(idempotency_key, reservation, None)
                 
+            except PaymentValidationError as e:
+                self.metrics.increment('payment_errors_validation')
+                self.metrics.stop_timer(timer_id)
+                return jsonify({"error": str(e)}), 400
             except ValueError as e:
                 self.metrics.increment('payment_errors_validation')
                 self.metrics.stop_timer(timer_id)
@@ -217,16 +267,19 @@ class SyncPayNode:
         @self.app.route('/health', methods=['GET'])
         def get_health():
             # Update metrics gauges
-            self.metrics.set_gauge('transaction_count', len(self.transactions))
-            self.metrics.set_gauge('is_leader', 1 if self.consensus.is_leader() else 0)
+            # Read once so the gauges and the response agree
+            is_leader = self.consensus.is_leader()
+            transaction_count = len(self.transactions)
+            self.metrics.set_gauge('transaction_count', transaction_count)
+            self.metrics.set_gauge('is_leader', 1 if is_leader else 0)
             
-            return jsonify({
+            return self.app.response_class(json_codec.dumps({
                 "node_id": self.node_id,
                 "status": "healthy",
-                "is_leader": self.consensus.is_leader(),
+                "is_leader": is_leader,
                 "timestamp": self.time_sync.get_synchronized_time(),
-                "transaction_count": len(self.transactions)
-            })
+                "transaction_count": transaction_count
+            }), mimetype='application/json')
         
         @self.app.route('/ping', methods=['GET'])
         def ping():
@@ -235,37 +288,106 @@ class SyncPayNode:
         
         @self.app.route('/transactions', methods=['GET'])
         def get_transactions():
-            # Return transactions sorted by synchronized timestamp
+            # Return transactions sorted by synchronized timestamp, optionally
+            # only those after ?since= and at most the latest ?limit=
+            snapshot = request.args.get('snapshot')
+            if snapshot is not None:
+                return self._snapshot_response(snapshot)
+            
+            try:
+                since = request.args.get('since')
+                since = float(since) if since is not None else None
+                limit = request.args.get('limit')
+                limit = int(limit) if limit is not None else None
+            except ValueError:
+                return jsonify({"error": "Invalid since/limit parameter"}), 400
+            
+            if since is None and limit is None:
+                return self._full_transactions_response()
+            
+            # transaction_log is kept in timestamp order, so only copy under the lock
             with self._transaction_lock:
-                sorted_transactions = sorted(
-                    [t.to_dict() for t in self.transactions.values()],
-                    key=lambda x: x['timestamp']
-                )
-            return jsonify({
-                "transactions": sorted_transactions,
-                "total_count": len(sorted_transactions),
+                if since is not None:
+                    selected = transactions_since(self.transaction_log, since)
+                else:
+                    selected = self.transaction_log[:]
+            if limit is not None:
+                selected = selected[-limit:] if limit > 0 else []
+            
+            return self.app.response_class(self._encode_transactions(selected),
+                                           mimetype='application/json')
+        
+        @self.app.route('/transactions/digest', methods=['GET'])
+        def get_transactions_digest():
+            # Digest of this node's copies of ?ids=, so peers can compare samples cheaply
+            ids = request.args.get('ids', '')
+            transaction_ids = ids.split(',') if ids else []
+            return self._rpc_response({
+                "digest": transactions_digest(self.transactions, transaction_ids),
                 "node_id": self.node_id
-            })
+            }, 200)
+        
+        @self.app.route('/transactions/stream', methods=['GET'])
+        def stream_transactions():
+            # Server-Sent Events: one event per transaction stored from now on
+            subscriber = Queue(maxsize=self.stream_queue_size)
+            with self._subscribers_lock:
+                self._subscribers.add(subscriber)
+            
+            def events():
+                try:
+                    # Sent straight away so the client sees the stream open
+                    yield b': connected\n\n'
+                    while True:
+                        try:
+                            yield b'data: ' + subscriber.get(timeout=15.0) + b'\n\n'
+                        except Empty:
+                            # Dropped for falling behind; end the stream so the client reconnects
+                            if subscriber not in self._subscribers:
+                                return
+                            # Comment line keeps proxies from closing an idle stream
+                            yield b': keepalive\n\n'
+                finally:
+                    with self._subscribers_lock:
+                        self._subscribers.discard(subscriber)
+            
+            return self.app.response_class(events(), mimetype='text/event-stream',
+                                           headers={'Cache-Control': 'no-cache'})
         
         @self.app.route('/status', methods=['GET'])
         def get_status():
-            return jsonify({
-                "node_id": self.node_id,
-                "is_leader": self.consensus.is_leader(),
-                "peer_health": self.health_monitor.get_peer_status(),
-                "replication_status": self.replicator.get_replication_status(),
-                "time_offset": self.time_sync.get_time_offset()
-            })
+            # Pollers within one interval share the same encoded body
+            cached = self._status_body
+            now = time.monotonic()
+            if cached is None or now - cached[0] >= self.config.status_snapshot_interval_ms / 1000.0:
+                cached = self._status_body = (now, json_codec.dumps({
+                    "node_id": self.node_id,
+                    "is_leader": self.consensus.is_leader(),
+                    "peer_health": self.health_monitor.get_peer_status(),
+                    "replication_status": self.replicator.get_replication_status(),
+                    "time_offset": self.time_sync.get_time_offset()
+                }))
+            return self.app.response_class(cached[1], mimetype='application/json')
         
         @self.app.route('/metrics', methods=['GET'])
         def get_metrics():
             """Get system metrics"""
-            format_type = request.args.get('format', 'json')
+            format_type = 'summary' if request.args.get('format') == 'summary' else 'json'
+            
+            # Building either format walks every histogram under the metrics
+            # lock, so scrapers within one interval share the same body
+            cached = self._metrics_bodies.get(format_type)
+            now = time.monotonic()
+            if cached is None or now - cached[0] >= self.config.metrics_snapshot_interval_ms / 1000.0:
+                if format_type == 'summary':
+                    body = self.metrics.get_summary().encode()
+                else:
+                    body = json_codec.dumps(self.metrics.get_all_metrics())
+                cached = self._metrics_bodies[format_type] = (now, body)
             
             if format_type == 'summary':
-                return self.metrics.get_summary(), 200, {'Content-Type': 'text/plain'}
-            else:
-                return jsonify(self.metrics.get_all_metrics())
+                return self.app.response_class(cached[1], content_type='text/plain')
+            return self.app.response_class(cached[1], mimetype='application/json')
         
         @self.app.route('/config', methods=['GET'])
         def get_config():
@@ -275,42 +397,311 @@ class SyncPayNode:
         # Internal endpoints for component communication
         @self.app.route('/replicate', methods=['POST'])
         def handle_replication():
-            response_data, status_code = self.replicator.handle_replication_request(request)
-            return jsonify(response_data), status_code
+            return self._rpc_response(*self.replicator.handle_replication_request(request))
         
         @self.app.route('/replicate/batch', methods=['POST'])
         def handle_batch_replication():
-            response_data, status_code = self.replicator.handle_batch_replication_request(request)
-            return jsonify(response_data), status_code
+            return self._rpc_response(*self.replicator.handle_batch_replication_request(request))
         
         @self.app.route('/consensus', methods=['POST'])
         def handle_consensus():
-            response_data, status_code = self.consensus.handle_consensus_request(request)
-            return jsonify(response_data), status_code
+            return self._rpc_response(*self.consensus.handle_consensus_request(request))
         
         @self.app.route('/time_sync', methods=['POST'])  
         def handle_time_sync():
-            response_data, status_code = self.time_sync.handle_sync_request(request)
-            return jsonify(response_data), status_code
+            return self._rpc_response(*self.time_sync.handle_sync_request(request))
     
-    def start(self):
-        """Start all background services and the Flask server"""
-        print(f"Starting SyncPay Node: {self.node_id}")
+    def _rpc_response(self, response_data, status_code):
+        """Encode a peer RPC handler's (dict, status) result straight into a response"""
+        return self.app.response_class(json_codec.dumps(response_data), status=status_code,
+                                       mimetype='application/json')
+    
+    def _timestamp_in_bounds(self, timestamp: float) -> bool:
+        """
+        Check a synchronized timestamp is within time_sync_max_skew of the
+        local clock. After max_skew_strikes misses in a row the node steps
+        down, so a broken time sync can't keep stamping the log.
+        """
+        if abs(timestamp - time.time()) <= self.config.time_sync_max_skew:
+            self._skew_strikes = 0
+            return True
         
+        self._skew_strikes += 1
+        self.logger.warning(f"Synchronized time is {timestamp - time.time():+.3f}s off the local clock")
+        if self._skew_strikes >= self.max_skew_strikes:
+            self.consensus.step_down()
+        return False
+    
+    def _install_ping_fast_path(self):
+        """Answer GET /ping in WSGI middleware, ahead of Flask's routing
+
+        Health monitors ping every peer each second; the body never changes,
+        so it is encoded once and returned without building a request context.
+        """
+        body = json_codec.dumps({"status": "ok", "node_id": self.node_id})
+        headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]
+        flask_app = self.app.wsgi_app
+
+        def wsgi_app(environ, start_response):
+            if environ.get('PATH_INFO') == '/ping' and environ.get('REQUEST_METHOD') == 'GET':
+                start_response('200 OK', list(headers))
+                return [body]
+            return flask_app(environ, start_response)
+
+        self.app.wsgi_app = wsgi_app
+
+    def _full_transactions_response(self):
+        """
+        /transactions without filters, encoded once per change to the log.
+        The ETag lets polling clients get a 304 instead of the body.
+        """
+        with self._transaction_lock:
+            log = self.transaction_log
+            # Entries are only inserted between compactions, so the snapshot
+            # count, length and newest id identify the state
+            key = (len(self._snapshot_index), len(log), log[-1].id if log else None)
+            cached = self._transactions_body
+            selected = log[:] if cached is None or cached[0] != key else None
+        
+        if selected is not None:
+            cached = self._transactions_body = (key, self._encode_transactions(selected))
+        
+        response = self.app.response_class(cached[1], mimetype='application/json')
+        response.set_etag("-".join(map(str, key)))
+        return response.make_conditional(request)
+    
+    def publish_transaction(self, transaction):
+        """Push a newly stored transaction to every /transactions/stream client"""
+        if not self._subscribers:
+            return
+        
+        data = transaction.to_json()
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(data)
+            except Full:
+                # A client this far behind is dropped rather than buffered without bound
+                with self._subscribers_lock:
+                    self._subscribers.discard(subscriber)
+    
+    def _submit_proposal(self, transaction):
+        """
+        Queue a transaction for the next consensus round
+        Returns a Future for the round's result, or None if the queue is full
+        """
+        with self._proposer_lock:
+            if self._proposer_thread is None or not self._proposer_thread.is_alive():
+                self._proposer_thread = threading.Thread(target=self._proposer_loop, daemon=True,
+                                                         name=f"proposer-{self.node_id}")
+                self._proposer_thread.start()
+        
+        future = Future()
         try:
-            # Start component services
-            self.health_monitor.start()     # Member 1: Start health monitoring
-            self.replicator.start()         # Member 2: Start replication service
-            self.time_sync.start()          # Member 3: Start time synchronization
-            self.consensus.start()          # Member 4: Start consensus protocol
-            self.deduplication_manager.start()  # Start deduplication service
+            self._proposal_queue.put_nowait((transaction, future))
+        except Full:
+            return None
+        return future
+    
+    def _proposer_loop(self):
+        """Propose queued transactions, batching whatever arrived during the last round"""
+        while True:
+            item = self._proposal_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # No waiting for a batch to fill: take only what is already queued
+            while len(batch) < self.max_proposal_batch:
+                try:
+                    item = self._proposal_queue.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    self._proposal_queue.put(None)
+                    break
+                batch.append(item)
             
-            # Start Flask server
-            host = self.node_config['host']
-            port = self.node_config['port']
-            print(f"SyncPay node {self.node_id} running on {host}:{port}")
+            # Requests that already timed out cancelled their Future; skip them
+            batch = [(transaction, future) for transaction, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
             
-            self.app.run(host=host, port=port, debug=False, threaded=True)
+            try:
+                result = self.consensus.propose_transaction_batch([t for t, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for _, future in batch:
+                    future.set_result(result)
+    
+    def compact_transactions(self):
+        """
+        Move all but the newest transaction_window_size transactions to the
+        snapshot file once the in-memory log holds twice that many
+        """
+        window = self.config.transaction_window_size
+        if len(self.transaction_log) <= 2 * window:
+            return
+        
+        with self._snapshot_lock:
+            with self._transaction_lock:
+                log = self.transaction_log
+                if len(log) <= 2 * window:
+                    return
+                evicted = log[:-window]
+                del log[:-window]
+                for transaction in evicted:
+                    self.transactions.pop(transaction.id, None)
+            
+            # The file belongs to this run; the first snapshot replaces any old one
+            data = b'[' + b','.join([t.to_json() for t in evicted]) + b']\n'
+            os.makedirs(os.path.dirname(self._snapshot_path), exist_ok=True)
+            with open(self._snapshot_path, 'ab' if self._snapshot_index else 'wb') as f:
+                offset = f.tell()
+                f.write(data)
+            self._snapshot_index.append((offset, len(data) - 1))
+        
+        self.logger.info(f"Compacted {len(evicted)} transactions into snapshot "
+                         f"{len(self._snapshot_index) - 1}")
+    
+    def _snapshot_response(self, snapshot: str):
+        """/transactions?snapshot=<n>: the transactions compacted into snapshot n"""
+        try:
+            number = int(snapshot)
+        except ValueError:
+            return jsonify({"error": "Invalid snapshot parameter"}), 400
+        
+        index = self._snapshot_index
+        if not 0 <= number < len(index):
+            return jsonify({"error": "Snapshot not found", "snapshot_count": len(index)}), 404
+        
+        offset, length = index[number]
+        with open(self._snapshot_path, 'rb') as f:
+            f.seek(offset)
+            transactions = f.read(length)
+        
+        return self.app.response_class(b''.join((
+            b'{"transactions":', transactions,
+            b',"snapshot":', str(number).encode(),
+            b',"snapshot_count":', str(len(index)).encode(),
+            b',"node_id":', json_codec.dumps(self.node_id),
+            b'}'
+        )), mimetype='application/json')
+    
+    def _encode_transactions(self, transactions) -> bytes:
+        """/transactions body, spliced from each transaction's cached encoding"""
+        return b''.join((
+            b'{"transactions":[',
+            b','.join([t.to_json() for t in transactions]),
+            b'],"total_count":', str(len(transactions)).encode(),
+            b',"node_id":', json_codec.dumps(self.node_id),
+            b'}'
+        ))
+    
+    def _payment_timeout(self) -> float:
+        """How long a payment waits for consensus: at least 5s, never shorter than a commit round"""
+        return max(5.0, self.consensus.consensus_timeout + 1.0)
+    
+    def _commit_payment(self, transaction: PaymentTransaction) -> dict:
+        """Store a transaction consensus accepted, queue its replication and build the response"""
+        # Committed: mark as confirmed before anyone can read or replicate it
+        transaction.status = "confirmed"
+        
+        # Store transaction locally
+        with self._transaction_lock:
+            self.transactions[transaction.id] = transaction
+            insert_by_timestamp(self.transaction_log, transaction)
+        self.publish_transaction(transaction)
+        self.compact_transactions()
+        
+        # Replicate to other nodes (Member 2) - only queues the transaction;
+        # replication workers send queued transactions in batches. The
+        # payment is already committed, so a failure here must not fail it.
+        try:
+            self.replicator.replicate_transaction(transaction)
+        except Exception as e:
+            self.logger.error(f"Failed to queue replication of {transaction.id}: {e}")
+        
+        # Record success metrics
+        self.metrics.increment('payment_success')
+        self.metrics.record_value('payment_amount', transaction.amount)
+        
+        return {
+            "status": "success",
+            "transaction_id": transaction.id,
+            "timestamp": transaction.timestamp,
+            "amount": transaction.amount,
+            "sender": transaction.sender,
+            "receiver": transaction.receiver,
+            "processed_by": self.node_id
+        }
+    
+    def _finish_late_payment(self, transaction, future, idempotency_key, reservation):
+        """Done callback for a proposal whose request already answered 504"""
+        try:
+            committed = future.result()
+        except Exception as e:
+            self.logger.error(f"Late consensus for {transaction.id} failed: {e}")
+            committed = False
+        
+        response_body = self._commit_payment(transaction) if committed else None
+        if reservation is not None:
+            self._complete_idempotency_key(idempotency_key, reservation, response_body)
+    
+    def _reserve_idempotency_key(self, key: str, payload: tuple):
+        """
+        Claim an Idempotency-Key for a new payment, evicting the least recently used
+        Returns (payload, marker, owner). The owner processes the payment and resolves
+        marker; otherwise payload and marker belong to the earlier request with that key
+        """
+        with self._idempotent_lock:
+            entry = self._idempotent_responses.get(key)
+            if entry is not None:
+                self._idempotent_responses.move_to_end(key)
+                return entry[0], entry[1], False
+            
+            marker = Future()
+            self._idempotent_responses[key] = (payload, marker)
+            if len(self._idempotent_responses) > self.idempotency_cache_size:
+                self._idempotent_responses.popitem(last=False)
+            return payload, marker, True
+    
+    def _complete_idempotency_key(self, key: str, marker: Future, response):
+        """Resolve a claimed key: response is replayed to retries, None releases the key"""
+        if response is None:
+            with self._idempotent_lock:
+                entry = self._idempotent_responses.get(key)
+                if entry is not None and entry[1] is marker:
+                    del self._idempotent_responses[key]
+        marker.set_result(response)
+    
+    def _idempotent_replay(self, reserved_payload: tuple, payload: tuple, marker: Future):
+        """Answer a request whose Idempotency-Key an earlier request already claimed"""
+        if reserved_payload != payload:
+            self.metrics.increment('payment_errors_idempotency_mismatch')
+            return jsonify({"error": "Idempotency-Key was already used for a different payment"}), 422
+        
+        # The original may still be in consensus; wait for its outcome
+        try:
+            response = marker.result(timeout=self._payment_timeout())
+        except FuturesTimeout:
+            return jsonify({"error": "Payment with this Idempotency-Key is still in progress"}), 409
+        if response is None:
+            return jsonify({"error": "Payment with this Idempotency-Key failed; retry"}), 409
+        
+        self.metrics.increment('payment_idempotent_replays')
+        return jsonify(response)
+    
+    def start(self, dev: bool = False):
+        """Start all background services and the HTTP server"""
+        print(f"Starting SyncPay Node: {self.node_id}")
+        
+        try:
+            self.start_services()
+            self.serve(dev=dev)
         except KeyboardInterrupt:
             print(f"\n\nShutting down {self.node_id} gracefully...")
             self.stop()
@@ -319,6 +710,35 @@ class SyncPayNode:
             self.stop()
             raise
     
+    def start_services(self):
+        """Start the background component services (no HTTP server)"""
+        self.health_monitor.start()     # Member 1: Start health monitoring
+        self.replicator.start()         # Member 2: Start replication service
+        self.time_sync.start()          # Member 3: Start time synchronization
+        if not self._timestamp_in_bounds(self.time_sync.get_synchronized_time()):
+            print(f"Warning: {self.node_id} synchronized clock is outside the allowed skew")
+        self.consensus.start()          # Member 4: Start consensus protocol
+        self.deduplication_manager.start()  # Start deduplication service
+    
+    def serve(self, dev: bool = False):
+        """Serve the Flask app until interrupted.
+        
+        Uses gevent's WSGI server when available so the I/O-bound internal
+        endpoints (/replicate, /consensus, /time_sync) are multiplexed on
+        greenlets; dev mode or a missing gevent uses Werkzeug's threaded server.
+        """
+        host = self.node_config['host']
+        port = self.node_config['port']
+        
+        if not dev and WSGIServer is not None:
+            print(f"SyncPay node {self.node_id} running on {host}:{port} (gevent)")
+            server = WSGIServer((host, port), self.app, log=None,
+                                spawn=self.config.server_worker_connections)
+            server.serve_forever()
+        else:
+            print(f"SyncPay node {self.node_id} running on {host}:{port}")
+            self.app.run(host=host, port=port, debug=False, threaded=True)
+    
     def stop(self):
         """Stop all services gracefully"""
         try:
@@ -327,22 +747,39 @@ class SyncPayNode:
             self.replicator.stop()
             self.time_sync.stop()
             self.consensus.stop()
+            self._proposal_queue.put(None)
             if hasattr(self.deduplication_manager, 'stop'):
                 self.deduplication_manager.stop()
             print(f"{self.node_id} stopped successfully")
+            # Flush queued log records last, after the components have logged their shutdown
+            _stop_log_listener()
         except Exception as e:
             print(f"Error during shutdown: {e}")
 
+def create_app(node_id: str) -> Flask:
+    """
+    Build a node with its background services running and return its Flask
+    app, for WSGI servers that load an app factory, e.g.
+        gunicorn -k gevent -w 1 -b localhost:5000 'main:create_app("node1")'
+    Use a single worker: each process is a whole node.
+    """
+    node = SyncPayNode(node_id)
+    node.start_services()
+    node.app.extensions['syncpay_node'] = node
+    return node.app
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python main.py <node_id>")
+    dev = '--dev' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--dev']
+    if len(args) != 1:
+        print("Usage: python main.py <node_id> [--dev]")
         print("Available nodes: node1, node2, node3")
         sys.exit(1)
     
-    node_id = sys.argv[1]
+    node_id = args[0]
     
     # Validate node_id
-    config = Config()
+    config = Config.get()
     if node_id not in config.node_configs:
         print(f"Invalid node_id: {node_id}")
         print(f"Available nodes: {list(config.node_configs.keys())}")
@@ -350,7 +787,7 @@ def main():
     
     # Start the SyncPay node
     node = SyncPayNode(node_id)
-    node.start()
+    node.start(dev=dev)
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,13 @@
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple
+import bisect
+import hashlib
+import os
 import time
-import uuid
+from utils import json_codec
 
-@dataclass
+@dataclass(slots=True)
 class PaymentTransaction:
     id: str
     amount: float
@@ -12,11 +16,14 @@ class PaymentTransaction:
     timestamp: float
     status: str = "pending"
     node_id: str = ""
+    # (status, bytes) cache behind to_json(); not part of the transaction's value
+    _json: Optional[Tuple[str, bytes]] = field(default=None, init=False, repr=False, compare=False)
     
     @classmethod
     def create(cls, amount: float, sender: str, receiver: str, node_id: str):
         return cls(
-            id=str(uuid.uuid4()),
+            # 128 random bits as hex; a UUID object adds nothing for an opaque id
+            id=os.urandom(16).hex(),
             amount=amount,
             sender=sender,
             receiver=receiver,
@@ -25,7 +32,90 @@ class PaymentTransaction:
         )
     
     def to_dict(self):
-        return asdict(self)
+        # Explicit literal: asdict() recurses and deep-copies every field
+        return {
+            'id': self.id,
+            'amount': self.amount,
+            'sender': self.sender,
+            'receiver': self.receiver,
+            'timestamp': self.timestamp,
+            'status': self.status,
+            'node_id': self.node_id
+        }
+    
+    def to_json(self) -> bytes:
+        """
+        JSON encoding of to_dict(), computed once per status. Other fields
+        don't change once a transaction is stored, so listings reuse it.
+        """
+        cached = self._json
+        if cached is None or cached[0] != self.status:
+            cached = self._json = (self.status, json_codec.dumps(self.to_dict()))
+        return cached[1]
+
+_by_timestamp = attrgetter('timestamp')
+
+def insert_by_timestamp(log: List[PaymentTransaction], transaction: PaymentTransaction):
+    """Insert a transaction into a timestamp-ordered list, keeping it ordered"""
+    # New transactions are almost always the latest, so try a plain append first
+    if not log or log[-1].timestamp <= transaction.timestamp:
+        log.append(transaction)
+    else:
+        bisect.insort_right(log, transaction, key=_by_timestamp)
+
+def transactions_since(log: List[PaymentTransaction], since: float) -> List[PaymentTransaction]:
+    """Transactions in a timestamp-ordered list that are newer than since"""
+    return log[bisect.bisect_right(log, since, key=_by_timestamp):]
+
+def transactions_digest(transactions: Dict[str, PaymentTransaction], transaction_ids: List[str]) -> str:
+    """
+    SHA-256 over the key fields of the given transactions, in the given order.
+    Nodes holding the same data for those ids produce the same digest.
+    """
+    digest = hashlib.sha256()
+    for transaction_id in transaction_ids:
+        txn = transactions.get(transaction_id)
+        # repr() is unambiguous and stable across nodes; missing ids hash as None
+        fields = (txn.id, float(txn.amount), txn.sender, txn.receiver, txn.status) if txn else None
+        digest.update(repr(fields).encode('utf-8'))
+    return digest.hexdigest()
+
+_PAYMENT_FIELDS = frozenset(('amount', 'sender', 'receiver'))
+
+class PaymentValidationError(ValueError):
+    """A payment request body failed validation; the message is client-facing"""
+
+def validate_payment(data, max_amount: float, max_name_length: int) -> Tuple[float, str, str]:
+    """
+    Validate a /payment request body in one pass
+    Returns (amount, sender, receiver) or raises PaymentValidationError
+    """
+    if not data:
+        raise PaymentValidationError("Request body is required")
+    if not isinstance(data, dict) or not _PAYMENT_FIELDS <= data.keys():
+        raise PaymentValidationError("Missing required fields: amount, sender, receiver")
+    
+    amount = data['amount']
+    if type(amount) is not float:
+        try:
+            amount = float(amount)
+        except (ValueError, TypeError):
+            raise PaymentValidationError("Invalid amount format") from None
+    if not amount > 0:
+        raise PaymentValidationError("Amount must be positive")
+    if amount > max_amount:
+        raise PaymentValidationError(f"Amount exceeds maximum limit of {max_amount}")
+    
+    sender = str(data['sender']).strip()
+    receiver = str(data['receiver']).strip()
+    if not sender or not receiver:
+        raise PaymentValidationError("Sender and receiver cannot be empty")
+    if sender == receiver:
+        raise PaymentValidationError("Sender and receiver cannot be the same")
+    if len(sender) > max_name_length or len(receiver) > max_name_length:
+        raise PaymentValidationError(f"Sender/receiver names too long (max {max_name_length} chars)")
+    
+    return amount, sender, receiver
 
 @dataclass
 class NodeInfo:
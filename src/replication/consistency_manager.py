@@ -3,10 +3,18 @@
 
 import time
 import threading
-from typing import Dict, List, Set, Optional
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Set, Optional, Tuple
+from collections import deque
 from enum import Enum
+from itertools import islice
 import logging
 
+from models import transactions_digest
+from utils import json_codec
+
 class ConsistencyLevel(Enum):
     STRONG = "strong"          # All nodes must acknowledge
     MAJORITY = "majority"      # Majority of nodes must acknowledge  
@@ -25,17 +33,69 @@ class ConsistencyManager:
         self.consistency_state = ConsistencyState.UNKNOWN
         self.consistency_checks = {}  # Track consistency status per peer
         self.version_vectors = {}     # Vector clocks for eventual consistency
-        self.conflict_resolution_log = []
+        self.conflict_resolution_log = deque()  # Resolutions from the last hour, oldest first
+        self._recent_conflict_times = deque()  # resolved_at of the last 30 minutes
+        self._conflict_total = 0
         
         # Monitoring
         self.last_consistency_check = 0
         self.consistency_check_interval = 30  # seconds
         self.consistency_lock = threading.Lock()
         
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
+        # HTTP session with connection pooling for peer state checks
+        self.session = self._create_session()
+        
+        # Worker pool for replicating a write to all peers at once, created
+        # on first use and shut down in stop()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
         self.logger = logging.getLogger(f"ConsistencyMgr-{node.node_id}")
     
+    def _create_session(self) -> requests.Session:
+        """Create a requests session with connection pooling"""
+        session = requests.Session()
+        
+        config = self.node.config
+        adapter = HTTPAdapter(
+            pool_connections=config.http_pool_connections,
+            pool_maxsize=config.http_pool_maxsize,
+            max_retries=0,  # We handle failures manually
+            pool_block=False
+        )
+        
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        
+        return session
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the replication worker pool, creating it on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                # One worker per pooled connection; more would only queue on the pool
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.node.config.http_pool_maxsize,
+                    thread_name_prefix=f"consistency-{self.node.node_id}"
+                )
+            return self._executor
+    
+    def stop(self):
+        """Shut down the replication worker pool"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+    
+    def _replicate_to_peers(self, transaction, peers: List[str]):
+        """
+        Start synchronous replication to every peer concurrently
+        Returns {future: peer}; iterate with as_completed and cancel the rest when done
+        """
+        executor = self._get_executor()
+        return {executor.submit(self._replicate_to_peer_sync, peer, transaction): peer
+                for peer in peers}
+    
     def set_consistency_level(self, level: ConsistencyLevel):
         """Set the consistency level for the system"""
         with self.consistency_lock:
@@ -45,6 +105,7 @@ class ConsistencyManager:
     
     def get_consistency_level(self) -> ConsistencyLevel:
         """Get current consistency level"""
+        # A single attribute read is atomic, so callers never wait on consistency_lock
         return self.consistency_level
     
     def ensure_write_consistency(self, transaction, peers: List[str]) -> bool:
@@ -58,18 +119,23 @@ class ConsistencyManager:
     
     def _ensure_strong_consistency(self, transaction, peers: List[str]) -> bool:
         """Ensure strong consistency - all nodes must acknowledge"""
-        self.logger.debug(f"Ensuring strong consistency for transaction {transaction.id}")
+        self.logger.debug("Ensuring strong consistency for transaction %s", transaction.id)
         
-        # All peers must successfully replicate
+        # All peers must successfully replicate; the first refusal decides
         successful_replications = 0
         total_peers = len(peers)
         
-        for peer in peers:
-            if self._replicate_to_peer_sync(peer, transaction):
-                successful_replications += 1
-            else:
-                self.logger.warning(f"Strong consistency failed - {peer} did not acknowledge")
-                return False
+        futures = self._replicate_to_peers(transaction, peers)
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    successful_replications += 1
+                else:
+                    self.logger.warning(f"Strong consistency failed - {futures[future]} did not acknowledge")
+                    return False
+        finally:
+            for future in futures:
+                future.cancel()
         
         # All nodes must acknowledge for strong consistency
         success = successful_replications == total_peers
@@ -83,7 +149,7 @@ class ConsistencyManager:
     
     def _ensure_majority_consistency(self, transaction, peers: List[str]) -> bool:
         """Ensure majority consistency - majority of nodes must acknowledge"""
-        self.logger.debug(f"Ensuring majority consistency for transaction {transaction.id}")
+        self.logger.debug("Ensuring majority consistency for transaction %s", transaction.id)
         
         total_nodes = len(peers) + 1  # +1 for current node
         required_acks = (total_nodes // 2) + 1  # Majority
@@ -91,14 +157,20 @@ class ConsistencyManager:
         # Current node counts as one acknowledgment
         successful_replications = 1
         
-        for peer in peers:
-            if self._replicate_to_peer_sync(peer, transaction):
-                successful_replications += 1
-                
-                # Check if we have majority
-                if successful_replications >= required_acks:
-                    self.logger.info(f"Majority consistency achieved for transaction {transaction.id} ({successful_replications}/{total_nodes})")
-                    return True
+        # Acks are counted as they arrive, so the slowest peers don't hold up a majority
+        futures = self._replicate_to_peers(transaction, peers)
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    successful_replications += 1
+                    
+                    # Check if we have majority
+                    if successful_replications >= required_acks:
+                        self.logger.info(f"Majority consistency achieved for transaction {transaction.id} ({successful_replications}/{total_nodes})")
+                        return True
+        finally:
+            for future in futures:
+                future.cancel()
         
         # Failed to achieve majority
         self.logger.error(f"Majority consistency failed for transaction {transaction.id} ({successful_replications}/{required_acks} required)")
@@ -106,7 +178,7 @@ class ConsistencyManager:
     
     def _ensure_eventual_consistency(self, transaction, peers: List[str]) -> bool:
         """Ensure eventual consistency - best effort async replication"""
-        self.logger.debug(f"Using eventual consistency for transaction {transaction.id}")
+        self.logger.debug("Using eventual consistency for transaction %s", transaction.id)
         
         # Update version vector
         self._update_version_vector(transaction)
@@ -138,18 +210,24 @@ class ConsistencyManager:
         """Update version vector for eventual consistency tracking"""
         node_id = self.node.node_id
         
-        if node_id not in self.version_vectors:
-            self.version_vectors[node_id] = 0
-        
-        self.version_vectors[node_id] += 1
-        
-        # Attach version vector to transaction for conflict resolution
-        if hasattr(transaction, 'version_vector'):
-            transaction.version_vector = self.version_vectors.copy()
+        # Writers serialize on consistency_lock; readers take copies without it
+        with self.consistency_lock:
+            if node_id not in self.version_vectors:
+                self.version_vectors[node_id] = 0
+            
+            self.version_vectors[node_id] += 1
+            
+            # Attach version vector to transaction for conflict resolution
+            if hasattr(transaction, 'version_vector'):
+                transaction.version_vector = self.version_vectors.copy()
     
-    def check_read_consistency(self, transaction_id: str) -> Dict:
-        """Check read consistency across all nodes for a specific transaction"""
-        self.logger.debug(f"Checking read consistency for transaction {transaction_id}")
+    def check_read_consistency(self, transaction_id: str,
+                               peer_snapshot: Optional[Dict[str, Optional[Dict]]] = None) -> Dict:
+        """
+        Check read consistency across all nodes for a specific transaction
+        peer_snapshot, from _snapshot_peer_transactions, is used instead of querying peers
+        """
+        self.logger.debug("Checking read consistency for transaction %s", transaction_id)
         
         consistency_report = {
             'transaction_id': transaction_id,
@@ -172,8 +250,16 @@ class ConsistencyManager:
         consistent_count = 1 if local_transaction else 0
         total_responses = 1
         
-        for peer in peers:
-            peer_state = self._check_peer_transaction_state(peer, transaction_id)
+        if peer_snapshot is not None:
+            peer_states = [self._lookup_peer_transaction(peer_snapshot.get(peer), transaction_id)
+                           for peer in peers]
+        else:
+            # Query all peers at once; map keeps results in peer order
+            peer_states = self._get_executor().map(
+                lambda peer: self._check_peer_transaction_state(peer, transaction_id), peers
+            )
+        
+        for peer, peer_state in zip(peers, peer_states):
             if peer_state:
                 consistency_report['node_states'][peer] = peer_state
                 total_responses += 1
@@ -203,44 +289,93 @@ class ConsistencyManager:
     
     def _check_peer_transaction_state(self, peer: str, transaction_id: str) -> Optional[Dict]:
         """Check transaction state on a specific peer"""
+        return self._lookup_peer_transaction(self._fetch_peer_transactions(peer), transaction_id)
+    
+    def _fetch_peer_transactions(self, peer: str) -> Optional[Dict[str, Dict]]:
+        """Fetch a peer's transactions indexed by id, or None if the peer didn't answer"""
         try:
-            import requests
-            response = requests.get(
+            response = self.session.get(
                 f"http://{peer}/transactions",
                 timeout=3.0
             )
             
             if response.status_code == 200:
-                data = response.json()
-                transactions = data.get('transactions', [])
-                
-                # Find the specific transaction
-                for txn in transactions:
-                    if txn['id'] == transaction_id:
-                        return {
-                            'has_transaction': True,
-                            'transaction_data': txn
-                        }
-                
-                return {'has_transaction': False, 'transaction_data': None}
+                data = json_codec.loads(response.content)
+                return {txn['id']: txn for txn in data.get('transactions', [])}
                 
         except Exception as e:
             self.logger.warning(f"Failed to check transaction state on {peer}: {e}")
         
         return None
     
+    def _fetch_peer_digest(self, peer: str, transaction_ids: List[str]) -> Optional[str]:
+        """Fetch a peer's digest of the given transactions, or None if the peer didn't answer"""
+        try:
+            response = self.session.get(
+                f"http://{peer}/transactions/digest",
+                params={'ids': ','.join(transaction_ids)},
+                timeout=3.0
+            )
+            
+            if response.status_code == 200:
+                return json_codec.loads(response.content).get('digest')
+                
+        except Exception as e:
+            self.logger.warning(f"Failed to fetch transaction digest from {peer}: {e}")
+        
+        return None
+    
+    def _snapshot_peer_transactions(self, peers: List[str],
+                                    transaction_ids: Optional[List[str]] = None) -> Dict[str, Optional[Dict[str, Dict]]]:
+        """
+        Fetch every peer's transactions once, concurrently
+        With transaction_ids, peers whose digest of those ids matches ours are
+        given our own copies instead of downloading their full list
+        """
+        executor = self._get_executor()
+        
+        in_sync = set()
+        if transaction_ids:
+            local_digest = transactions_digest(self.node.transactions, transaction_ids)
+            digests = executor.map(lambda peer: self._fetch_peer_digest(peer, transaction_ids), peers)
+            in_sync = {peer for peer, digest in zip(peers, digests) if digest == local_digest}
+        
+        diverging = [peer for peer in peers if peer not in in_sync]
+        snapshot = dict(zip(diverging, executor.map(self._fetch_peer_transactions, diverging)))
+        
+        if in_sync:
+            local_index = {}
+            for transaction_id in transaction_ids:
+                txn = self.node.transactions.get(transaction_id)
+                if txn:
+                    local_index[transaction_id] = txn.to_dict()
+            snapshot.update(dict.fromkeys(in_sync, local_index))
+        
+        return snapshot
+    
+    @staticmethod
+    def _lookup_peer_transaction(peer_transactions: Optional[Dict[str, Dict]],
+                                 transaction_id: str) -> Optional[Dict]:
+        """Build a peer state entry from that peer's indexed transactions"""
+        if peer_transactions is None:
+            return None
+        
+        txn = peer_transactions.get(transaction_id)
+        return {
+            'has_transaction': txn is not None,
+            'transaction_data': txn
+        }
+    
     def _transactions_match(self, local_txn, peer_txn_data) -> bool:
         """Compare two transactions for consistency"""
         if not peer_txn_data:
             return False
         
-        # Compare key fields
+        # Compare key fields as tuples, so the field-by-field comparison runs in C
+        get = peer_txn_data.get
         return (
-            local_txn.id == peer_txn_data.get('id') and
-            local_txn.amount == peer_txn_data.get('amount') and
-            local_txn.sender == peer_txn_data.get('sender') and
-            local_txn.receiver == peer_txn_data.get('receiver') and
-            local_txn.status == peer_txn_data.get('status')
+            (local_txn.id, local_txn.amount, local_txn.sender, local_txn.receiver, local_txn.status) ==
+            (get('id'), get('amount'), get('sender'), get('receiver'), get('status'))
         )
     
     def resolve_conflicts(self, conflicts: List[Dict]) -> List[Dict]:
@@ -265,10 +400,31 @@ class ConsistencyManager:
                 'resolved_at': time.time()
             })
             
-            self.conflict_resolution_log.append(resolved_conflicts[-1])
+            with self.consistency_lock:
+                self.conflict_resolution_log.append(resolved_conflicts[-1])
+                self._recent_conflict_times.append(resolved_conflicts[-1]['resolved_at'])
+                self._conflict_total += 1
+                self._expire_conflicts(time.time())
         
         return resolved_conflicts
     
+    def _expire_conflicts(self, current_time: float):
+        """Drop conflicts that aged out of the 1h and 30m windows; caller holds consistency_lock"""
+        log = self.conflict_resolution_log
+        while log and current_time - log[0]['resolved_at'] >= 3600:
+            log.popleft()
+        
+        times = self._recent_conflict_times
+        while times and current_time - times[0] >= 1800:
+            times.popleft()
+    
+    def _count_recent_conflicts(self, current_time: float) -> Tuple[int, int]:
+        """Return (last hour, last 30 minutes) conflict counts"""
+        # Only expired entries are touched, so this costs nothing like a scan of the log
+        with self.consistency_lock:
+            self._expire_conflicts(current_time)
+            return len(self.conflict_resolution_log), len(self._recent_conflict_times)
+    
     def _resolve_data_mismatch(self, conflict: Dict) -> Dict:
         """Resolve data mismatch conflicts using last-writer-wins"""
         # Simple last-writer-wins strategy based on timestamp
@@ -308,18 +464,26 @@ class ConsistencyManager:
             'recommendations': []
         }
         
-        # Get all local transactions
-        local_transactions = list(self.node.transactions.keys())
-        consistency_report['transaction_count'] = len(local_transactions)
-        
-        # Check consistency for a sample of recent transactions
-        sample_size = min(20, len(local_transactions))  # Check last 20 transactions
-        recent_transactions = local_transactions[-sample_size:] if local_transactions else []
+        # Check consistency for a sample of recent transactions; the dict keeps
+        # insertion order, so walk it backwards instead of copying every id
+        with self.node._transaction_lock:
+            local_transactions = self.node.transactions
+            consistency_report['transaction_count'] = len(local_transactions)
+            sample_size = min(20, len(local_transactions))  # Check last 20 transactions
+            recent_transactions = list(islice(reversed(local_transactions), sample_size))[::-1]
         
         inconsistent_count = 0
         
+        # One fetch per peer serves every sampled transaction, and peers whose
+        # digest of the sample matches ours skip the full listing altogether
+        peer_snapshot = None
+        if recent_transactions:
+            peer_snapshot = self._snapshot_peer_transactions(
+                self.node.config.get_peers(self.node.node_id), recent_transactions
+            )
+        
         for transaction_id in recent_transactions:
-            txn_consistency = self.check_read_consistency(transaction_id)
+            txn_consistency = self.check_read_consistency(transaction_id, peer_snapshot)
             
             if not txn_consistency['consistent']:
                 inconsistent_count += 1
@@ -360,16 +524,19 @@ class ConsistencyManager:
     
     def get_consistency_metrics(self) -> Dict:
         """Get current consistency metrics and status"""
+        # The version vector is copied without the lock so the dict is safe
+        # to serialize afterwards; conflict counts only expire old entries
         current_time = time.time()
+        version_vectors = self.version_vectors.copy()
+        recent_conflicts, _ = self._count_recent_conflicts(current_time)
         
         return {
             'consistency_level': self.consistency_level.value,
             'consistency_state': self.consistency_state.value,
             'last_check_ago': current_time - self.last_consistency_check,
-            'conflict_count': len(self.conflict_resolution_log),
-            'recent_conflicts': len([c for c in self.conflict_resolution_log 
-                                   if current_time - c['resolved_at'] < 3600]),  # Last hour
-            'version_vectors': self.version_vectors,
+            'conflict_count': self._conflict_total,
+            'recent_conflicts': recent_conflicts,  # Last hour
+            'version_vectors': version_vectors,
             'recommendations': self._get_current_recommendations()
         }
     
@@ -387,8 +554,7 @@ class ConsistencyManager:
             })
         
         # Check if there are many recent conflicts
-        recent_conflicts = len([c for c in self.conflict_resolution_log 
-                              if current_time - c['resolved_at'] < 1800])  # Last 30 minutes
+        _, recent_conflicts = self._count_recent_conflicts(current_time)  # Last 30 minutes
         
         if recent_conflicts > 5:
             recommendations.append({
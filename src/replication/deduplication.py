@@ -33,8 +33,6 @@ class DeduplicationManager:
         self.cleanup_thread = None
         self.is_running = False
         
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"Deduplication-{node.node_id}")
     
     def start(self):
@@ -101,7 +99,7 @@ class DeduplicationManager:
             # Add to bloom filter
             self.bloom_filter.add(content_hash)
             
-            self.logger.debug(f"Registered transaction {transaction.id} for deduplication")
+            self.logger.debug("Registered transaction %s for deduplication", transaction.id)
     
     def _compute_transaction_hash(self, transaction) -> str:
         """
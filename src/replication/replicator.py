@@ -11,6 +11,8 @@ from typing import Dict, List, Optional, Any
 from collections import defaultdict, deque
 import logging
 from datetime import datetime
+from models import PaymentTransaction, insert_by_timestamp
+from utils import json_codec
 
 class PaymentReplicator:
     def __init__(self, node):
@@ -20,6 +22,8 @@ class PaymentReplicator:
         self.replication_status = {}  # peer -> status dict
         self.pending_replications = defaultdict(deque)  # peer -> queue of transactions
         self.replication_lock = threading.Lock()
+        # Signalled when work is queued so idle workers wake immediately
+        self.replication_ready = threading.Condition(self.replication_lock)
 
         # Worker threads
         self.worker_threads = []
@@ -30,7 +34,8 @@ class PaymentReplicator:
         self.replication_timeout = 5.0  # seconds
         self.max_retry_attempts = 3
         self.retry_delay = 1.0  # seconds
-        self.batch_size = 10  # Max transactions per batch
+        self.batch_size = node.config.replication_batch_size  # Max transactions per batch
+        self.batch_max_wait = node.config.replication_batch_max_wait_ms / 1000.0  # seconds a partial batch may wait to fill
 
         # HTTP Session with connection pooling for better performance
         self.session = self._create_session()
@@ -44,13 +49,15 @@ class PaymentReplicator:
             'last_replication_time': 0.0
         }
 
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"Replicator-{node.node_id}")
 
     def _create_session(self) -> requests.Session:
-        """Create a requests session with connection pooling and retry logic"""
+        """
+        Create a requests session with connection pooling and retry logic.
+        Connections to each peer are kept alive and shared by all workers.
+        """
         session = requests.Session()
+        config = self.node.config
         
         # Configure retry strategy
         retry_strategy = Retry(
@@ -59,15 +66,19 @@ class PaymentReplicator:
             status_forcelist=[]
         )
         
+        # One pool per peer host; each pool keeps enough idle connections for
+        # every worker to have a request in flight, so none is opened per batch
         adapter = HTTPAdapter(
-            pool_connections=10,
-            pool_maxsize=20,
+            pool_connections=config.http_pool_connections,
+            pool_maxsize=max(config.http_pool_maxsize, self.num_workers),
             max_retries=retry_strategy,
             pool_block=False
         )
         
         session.mount("http://", adapter)
         session.mount("https://", adapter)
+        # Bodies are pre-encoded bytes, so set the content type once here
+        session.headers['Content-Type'] = 'application/json'
         
         return session
 
@@ -81,16 +92,9 @@ class PaymentReplicator:
 
         # Initialize replication status for all peers
         peers = self.node.config.get_peers(self.node.node_id)
-        for peer in peers:
-            self.replication_status[peer] = {
-                'is_connected': True,
-                'pending_count': 0,
-                'last_successful_replication': time.time(),
-                'last_attempt': 0.0,
-                'consecutive_failures': 0,
-                'total_replications': 0,
-                'successful_replications': 0
-            }
+        with self.replication_lock:
+            for peer in peers:
+                self._peer_status(peer)
 
         # Start worker threads for async replication
         for i in range(self.num_workers):
@@ -105,11 +109,30 @@ class PaymentReplicator:
 
         self.logger.info(f"Started {self.num_workers} replication worker threads")
 
+    def _peer_status(self, peer: str) -> Dict[str, Any]:
+        """Status entry for peer, created on first use (caller holds replication_lock)"""
+        status = self.replication_status.get(peer)
+        if status is None:
+            status = self.replication_status[peer] = {
+                'is_connected': True,
+                'pending_count': 0,
+                'last_successful_replication': time.time(),
+                'last_attempt': 0.0,
+                'consecutive_failures': 0,
+                'total_replications': 0,
+                'successful_replications': 0
+            }
+        return status
+
     def stop(self):
         """Stop the replication service"""
         self.is_running = False
         self.logger.info("Stopping payment replication service")
 
+        # Wake idle workers so they see is_running and exit
+        with self.replication_ready:
+            self.replication_ready.notify_all()
+
         # Wait for worker threads to finish
         for worker in self.worker_threads:
             worker.join(timeout=5.0)
@@ -134,10 +157,11 @@ class PaymentReplicator:
         self.logger.info(f"Replicating transaction {transaction.id} to {len(peers)} peers")
 
         # Queue transaction for async replication to all peers
-        for peer in peers:
-            with self.replication_lock:
+        with self.replication_ready:
+            for peer in peers:
                 self.pending_replications[peer].append(transaction)
-                self.replication_status[peer]['pending_count'] += 1
+                self._peer_status(peer)['pending_count'] += 1
+            self.replication_ready.notify(len(peers))
 
         # Update metrics
         self.replication_stats['total_sent'] += len(peers)
@@ -145,62 +169,78 @@ class PaymentReplicator:
 
     def _replication_worker(self, worker_id: int):
         """Worker thread for processing replication queue"""
-        self.logger.debug(f"Replication worker {worker_id} started")
+        self.logger.debug("Replication worker %s started", worker_id)
 
         while self.is_running:
             try:
-                # Get next transaction to replicate
-                transaction = None
+                # Get next batch of transactions to replicate
                 target_peer = None
 
-                with self.replication_lock:
+                with self.replication_ready:
                     # Find a peer with pending transactions
                     for peer, queue in self.pending_replications.items():
                         if queue:
-                            transaction = queue.popleft()
-                            self.replication_status[peer]['pending_count'] -= 1
                             target_peer = peer
                             break
+                    else:
+                        # No work to do; block until replicate_transaction signals
+                        # (the timeout only bounds how long a missed wakeup can stall)
+                        self.replication_ready.wait(timeout=1.0)
+                        continue
+
+                    # Give a partial batch a moment to fill so bursts of payments
+                    # go out in one request instead of one request each
+                    deadline = time.monotonic() + self.batch_max_wait
+                    while len(queue) < self.batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.replication_ready.wait(timeout=remaining)
 
-                if transaction and target_peer:
-                    self._replicate_to_peer(target_peer, transaction)
-                else:
-                    # No work to do, sleep briefly
-                    time.sleep(0.1)
+                    batch = [queue.popleft() for _ in range(min(len(queue), self.batch_size))]
+                    if not batch:
+                        continue  # Drained by another worker or a peer failure
+                    self.replication_status[target_peer]['pending_count'] -= len(batch)
+
+                self._replicate_to_peer(target_peer, batch)
 
             except Exception as e:
                 self.logger.error(f"Error in replication worker {worker_id}: {e}")
                 time.sleep(1.0)
 
-        self.logger.debug(f"Replication worker {worker_id} stopped")
+        self.logger.debug("Replication worker %s stopped", worker_id)
 
-    def _replicate_to_peer(self, peer: str, transaction):
-        """Replicate a single transaction to a specific peer"""
+    def _replicate_to_peer(self, peer: str, transactions: List):
+        """Replicate a batch of transactions to a specific peer"""
         start_time = time.time()
         success = False
+        count = len(transactions)
 
         try:
-            # Send replication request
-            success = self._send_replication_request(peer, transaction, sync=False)
+            # Send replication request (one transaction uses the plain endpoint)
+            if count == 1:
+                success = self._send_replication_request(peer, transactions[0], sync=False)
+            else:
+                success = self._send_batch_request(peer, transactions)
 
         except Exception as e:
-            self.logger.error(f"Failed to replicate transaction {transaction.id} to {peer}: {e}")
+            self.logger.error(f"Failed to replicate {count} transaction(s) to {peer}: {e}")
 
         finally:
             # Update peer status
             with self.replication_lock:
                 status = self.replication_status[peer]
                 status['last_attempt'] = time.time()
-                status['total_replications'] += 1
+                status['total_replications'] += count
 
                 if success:
                     status['last_successful_replication'] = time.time()
                     status['consecutive_failures'] = 0
-                    status['successful_replications'] += 1
-                    self.replication_stats['total_successful'] += 1
+                    status['successful_replications'] += count
+                    self.replication_stats['total_successful'] += count
                 else:
                     status['consecutive_failures'] += 1
-                    self.replication_stats['total_failed'] += 1
+                    self.replication_stats['total_failed'] += count
 
             # Update response time metric
             response_time = time.time() - start_time
@@ -212,29 +252,30 @@ class PaymentReplicator:
         Returns True if successful, False otherwise
         """
         url = f"http://{peer}/replicate"
-        payload = {
-            'transaction': transaction.to_dict(),
-            'source_node': self.node.node_id,
-            'timestamp': time.time()
-        }
+        # Splice in the transaction's cached encoding instead of re-encoding it
+        body = b''.join((
+            b'{"transaction":', transaction.to_json(),
+            b',"source_node":', json_codec.dumps(self.node.node_id),
+            b',"timestamp":', json_codec.dumps(time.time()),
+            b'}'
+        ))
 
         for attempt in range(self.max_retry_attempts):
             try:
                 response = self.session.post(
                     url,
-                    json=payload,
-                    timeout=self.replication_timeout,
-                    headers={'Content-Type': 'application/json'}
+                    data=body,
+                    timeout=self.replication_timeout
                 )
 
                 if response.status_code == 200:
-                    response_data = response.json()
+                    response_data = json_codec.loads(response.content)
                     status = response_data.get('status')
                     if status == 'success':
-                        self.logger.debug(f"Successfully replicated transaction {transaction.id} to {peer}")
+                        self.logger.debug("Successfully replicated transaction %s to %s", transaction.id, peer)
                         return True
                     elif status == 'duplicate' or status == 'already_exists':
-                        self.logger.debug(f"Transaction {transaction.id} already exists on {peer}")
+                        self.logger.debug("Transaction %s already exists on %s", transaction.id, peer)
                         return True  # Treat duplicates as success
                     else:
                         self.logger.warning(f"Replication rejected by {peer}: {response_data.get('error', 'unknown error')}")
@@ -287,23 +328,13 @@ class PaymentReplicator:
                         "original_transaction_id": original_id
                     }, 200
 
-            # Store transaction locally
-            # Use node's transaction lock for thread safety
-            with self.node._transaction_lock:
-                if transaction.id not in self.node.transactions:
-                    self.node.transactions[transaction.id] = transaction
-                    self.node.transaction_log.append(transaction)
-
-                    # Register with deduplication manager
-                    if hasattr(self.node, 'deduplication_manager'):
-                        self.node.deduplication_manager.register_transaction(transaction)
+            # Store transaction locally; the node lock only covers the insert
+            if not self._store_transaction(transaction):
+                self.logger.debug("Transaction %s already exists", transaction.id)
+                return {"status": "already_exists", "transaction_id": transaction.id}, 200
 
-                    self.logger.info(f"Successfully replicated transaction {transaction.id} from {source_node}")
-                    return {"status": "success", "transaction_id": transaction.id}, 200
-                else:
-                    # Transaction already exists
-                    self.logger.debug(f"Transaction {transaction.id} already exists")
-                    return {"status": "already_exists", "transaction_id": transaction.id}, 200
+            self.logger.info(f"Successfully replicated transaction {transaction.id} from {source_node}")
+            return {"status": "success", "transaction_id": transaction.id}, 200
 
         except Exception as e:
             self.logger.error(f"Error handling replication request: {e}")
@@ -339,23 +370,9 @@ class PaymentReplicator:
                         if is_duplicate and not is_sync:
                             continue  # Skip duplicates in normal operation
 
-                    # Store transaction locally
-                    import threading
-                    if not hasattr(self.node, '_transaction_lock'):
-                        self.node._transaction_lock = threading.Lock()
-                        
-                    with self.node._transaction_lock:
-                        if transaction.id not in self.node.transactions:
-                            self.node.transactions[transaction.id] = transaction
-                            self.node.transaction_log.append(transaction)
-
-                            # Register with deduplication manager
-                            if hasattr(self.node, 'deduplication_manager'):
-                                self.node.deduplication_manager.register_transaction(transaction)
-
-                            successful_count += 1
-                        else:
-                            successful_count += 1  # Already exists, consider successful
+                    # Store transaction locally (already existing counts as success)
+                    self._store_transaction(transaction)
+                    successful_count += 1
 
                 except Exception as e:
                     failed_count += 1
@@ -375,11 +392,29 @@ class PaymentReplicator:
             self.logger.error(f"Error handling batch replication request: {e}")
             return {"error": str(e)}, 500
 
+    def _store_transaction(self, transaction) -> bool:
+        """
+        Add a replicated transaction to the node's state
+        Returns False if the node already had it
+        """
+        # Hold the node lock only for the check-and-insert; deduplication
+        # registration has its own lock and doesn't need to block readers
+        with self.node._transaction_lock:
+            if transaction.id in self.node.transactions:
+                return False
+            self.node.transactions[transaction.id] = transaction
+            insert_by_timestamp(self.node.transaction_log, transaction)
+
+        if hasattr(self.node, 'deduplication_manager'):
+            self.node.deduplication_manager.register_transaction(transaction)
+        if hasattr(self.node, 'publish_transaction'):
+            self.node.publish_transaction(transaction)
+        if hasattr(self.node, 'compact_transactions'):
+            self.node.compact_transactions()
+        return True
+
     def _dict_to_transaction(self, data: Dict) -> Any:
         """Convert dictionary to PaymentTransaction object"""
-        # Import here to avoid circular imports
-        from models import PaymentTransaction
-
         return PaymentTransaction(
             id=data['id'],
             amount=data['amount'],
@@ -409,43 +444,60 @@ class PaymentReplicator:
         for i in range(0, len(transactions), batch_size):
             batch = transactions[i:i + batch_size]
 
-            if not self._sync_batch_with_peer(peer_url, batch):
+            if not self._send_batch_request(peer_url, batch, is_sync=True):
                 self.logger.error(f"Failed to sync batch with {peer_url}, stopping sync")
                 break
 
         self.logger.info(f"Completed sync with recovered peer {peer_url}")
 
-    def _sync_batch_with_peer(self, peer: str, transactions: List) -> bool:
-        """Sync a batch of transactions with a peer"""
+    def _send_batch_request(self, peer: str, transactions: List, is_sync: bool = False) -> bool:
+        """
+        Send several transactions to a peer in one /replicate/batch request
+        Returns True if the peer stored (or already had) all of them
+        """
         url = f"http://{peer}/replicate/batch"
-        payload = {
-            'transactions': [t.to_dict() for t in transactions],
-            'source_node': self.node.node_id,
-            'timestamp': time.time(),
-            'is_sync': True
-        }
+        # Splice in each transaction's cached encoding instead of re-encoding it
+        body = b''.join((
+            b'{"transactions":[', b','.join([t.to_json() for t in transactions]),
+            b'],"source_node":', json_codec.dumps(self.node.node_id),
+            b',"timestamp":', json_codec.dumps(time.time()),
+            b',"is_sync":', b'true' if is_sync else b'false',
+            b'}'
+        ))
 
-        try:
-            response = self.session.post(
-                url,
-                json=payload,
-                timeout=self.replication_timeout * 2,  # Longer timeout for batch
-                headers={'Content-Type': 'application/json'}
-            )
+        for attempt in range(self.max_retry_attempts):
+            try:
+                response = self.session.post(
+                    url,
+                    data=body,
+                    timeout=self.replication_timeout * 2  # Longer timeout for batch
+                )
 
-            if response.status_code == 200:
-                response_data = response.json()
-                successful = response_data.get('successful_count', 0)
-                total = len(transactions)
-                self.logger.debug(f"Batch sync to {peer}: {successful}/{total} transactions")
-                return successful == total
-            else:
-                self.logger.warning(f"Batch sync failed to {peer}: HTTP {response.status_code}")
-                return False
+                if response.status_code == 200:
+                    response_data = json_codec.loads(response.content)
+                    # Outside of sync, duplicates are skipped rather than counted,
+                    # so judge the batch by its failures
+                    failed = response_data.get('failed_count', 0)
+                    self.logger.debug("Batch to %s: %s/%s transactions failed", peer, failed, len(transactions))
+                    if failed == 0:
+                        return True
+                    self.logger.warning(f"Batch partially rejected by {peer}: {response_data.get('errors')}")
+                    return False
+                else:
+                    self.logger.warning(f"Batch replication failed to {peer}: HTTP {response.status_code}")
 
-        except Exception as e:
-            self.logger.error(f"Error during batch sync to {peer}: {e}")
-            return False
+            except requests.exceptions.Timeout:
+                self.logger.warning(f"Batch replication timeout to {peer} (attempt {attempt + 1}/{self.max_retry_attempts})")
+            except requests.exceptions.ConnectionError:
+                self.logger.warning(f"Connection error batch replicating to {peer} (attempt {attempt + 1}/{self.max_retry_attempts})")
+            except Exception as e:
+                self.logger.error(f"Unexpected error batch replicating to {peer}: {e}")
+
+            # Wait before retry
+            if attempt < self.max_retry_attempts - 1:
+                time.sleep(self.retry_delay * (attempt + 1))
+
+        return False
 
     def handle_peer_failure(self, peer_url: str):
         """Handle peer failure - mark as disconnected and clear pending replications"""
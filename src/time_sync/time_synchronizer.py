@@ -38,8 +38,6 @@ class TimeSynchronizer:
         # HTTP Session for better performance
         self.session = self._create_session()
 
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"TimeSync-{node.node_id}")
 
     def _create_session(self) -> requests.Session:
@@ -129,7 +127,7 @@ class TimeSynchronizer:
 
         # Perform multiple rounds for better accuracy
         for round_num in range(3):
-            self.logger.debug(f"Initial sync round {round_num + 1}/3")
+            self.logger.debug("Initial sync round %s/3", round_num + 1)
             self._perform_sync_round()
 
             if len(self.time_samples) >= self.min_samples:
@@ -146,7 +144,7 @@ class TimeSynchronizer:
         if not peers:
             return
 
-        self.logger.debug(f"Starting sync round with {len(peers)} peers")
+        self.logger.debug("Starting sync round with %s peers", len(peers))
 
         # Sync with each peer
         for peer in peers:
@@ -226,9 +224,9 @@ class TimeSynchronizer:
                 return median_offset
 
         except requests.exceptions.Timeout:
-            self.logger.debug(f"Time sync timeout with {peer}")
+            self.logger.debug("Time sync timeout with %s", peer)
         except requests.exceptions.ConnectionError:
-            self.logger.debug(f"Connection error syncing with {peer}")
+            self.logger.debug("Connection error syncing with %s", peer)
         except Exception as e:
             self.logger.error(f"Unexpected error syncing with {peer}: {e}")
 
@@ -280,7 +278,7 @@ class TimeSynchronizer:
         if len(filtered_offsets) > 1:
             self.sync_accuracy = statistics.stdev(filtered_offsets) / 2  # Half the standard deviation
 
-        self.logger.debug(f"Calculated offset: {self.time_offset:.3f}s, accuracy: {self.sync_accuracy:.3f}s")
+        self.logger.debug("Calculated offset: %.3fs, accuracy: %.3fs", self.time_offset, self.sync_accuracy)
 
     def _filter_outliers(self, offsets: List[float]) -> List[float]:
         """Filter out outlier offsets using statistical method"""
@@ -313,7 +311,7 @@ class TimeSynchronizer:
             # Get current time (t2 and t3 are the same for simplicity)
             t2 = t3 = time.time()
 
-            self.logger.debug(f"Time sync request from {source_node}")
+            self.logger.debug("Time sync request from %s", source_node)
 
             return {
                 "t2": t2,  # Time when request was received
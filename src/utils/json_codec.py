@@ -0,0 +1,34 @@
+# src/utils/json_codec.py
+# JSON encoding/decoding helpers
+
+import json
+
+# orjson is an optional accelerator; fall back to the stdlib when it's missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so this catches both
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, default=None) -> bytes:
+    """Serialize obj to compact JSON bytes; default converts unsupported types"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    return json.dumps(obj, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def dumps_pretty(obj) -> bytes:
+    """Serialize obj to human-readable JSON bytes (2-space indent, sorted keys)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, indent=2, sort_keys=True).encode('utf-8')
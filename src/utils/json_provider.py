@@ -0,0 +1,26 @@
+# src/utils/json_provider.py
+# Flask JSON provider backed by json_codec
+
+from flask.json.provider import DefaultJSONProvider
+
+from utils import json_codec
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """
+    Routes request.get_json() and jsonify() through json_codec (orjson when
+    installed). Types JSON can't represent natively (dates, dataclasses,
+    Decimal) still go through Flask's default conversion.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return json_codec.dumps(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Build the body as bytes directly instead of via a str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_codec.dumps(obj, default=self.default),
+                                        mimetype=self.mimetype)
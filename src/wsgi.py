@@ -0,0 +1,13 @@
+# src/wsgi.py
+# WSGI entry point for running a node under an external server, e.g.
+#   SYNCPAY_NODE_ID=node1 gunicorn -k gevent -w 1 --worker-connections 2000 \
+#       -b localhost:5000 wsgi:application
+
+import os
+from main import create_app
+
+node_id = os.environ.get('SYNCPAY_NODE_ID')
+if not node_id:
+    raise RuntimeError("Set SYNCPAY_NODE_ID to the node this server should run")
+
+application = create_app(node_id)
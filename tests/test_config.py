@@ -0,0 +1,231 @@
+# tests/test_config.py
+# Unit tests for Config loading
+
+import unittest
+import json
+import os
+import tempfile
+import sys
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import config
+from config import Config
+from utils import json_codec
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        config._CONFIG_CACHE.clear()
+        Config._INSTANCES.clear()
+
+        # Write a small config file
+        fd, self.config_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'consensus_timeout': 2.5}, f)
+
+    def tearDown(self):
+        """Remove the temporary config file"""
+        os.remove(self.config_path)
+
+    def test_load_from_file(self):
+        """Test loading settings from a JSON file"""
+        cfg = Config(self.config_path)
+
+        self.assertEqual(cfg.consensus_timeout, 2.5)
+
+    def test_load_from_file_validates(self):
+        """Test file values are coerced to the schema and unknown keys dropped"""
+        with open(self.config_path, 'w') as f:
+            json.dump({
+                'consensus_timeout': 3,
+                'consensus_timout': 9.0,
+                'replication_batch_size': 'lots',
+                'node_configs': ['node1']
+            }, f)
+
+        with patch('builtins.print'):
+            cfg = Config(self.config_path)
+
+        self.assertIsInstance(cfg.consensus_timeout, float)
+        self.assertEqual(cfg.consensus_timeout, 3.0)
+        self.assertFalse(hasattr(cfg, 'consensus_timout'))
+        self.assertEqual(cfg.replication_batch_size, 10)
+        self.assertIn('node1', cfg.node_configs)
+
+    def test_load_from_file_rejects_lossy_values(self):
+        """Test fractional and boolean values aren't coerced into numeric settings"""
+        with open(self.config_path, 'w') as f:
+            json.dump({
+                'replication_batch_size': 2.7,
+                'replication_worker_count': 4.0,
+                'replication_max_retries': True,
+                'consensus_timeout': False
+            }, f)
+
+        with patch('builtins.print'):
+            cfg = Config(self.config_path)
+
+        self.assertEqual(cfg.replication_batch_size, 10)
+        self.assertEqual(cfg.replication_worker_count, 4)
+        self.assertIsInstance(cfg.replication_worker_count, int)
+        self.assertEqual(cfg.replication_max_retries, 3)
+        self.assertEqual(cfg.consensus_timeout, 2.0)
+
+    def test_load_from_file_cached(self):
+        """Test repeated loads of an unchanged file reuse the parsed data"""
+        Config(self.config_path)
+
+        with patch('builtins.open') as mock_open:
+            cfg = Config(self.config_path)
+            mock_open.assert_not_called()
+
+        self.assertEqual(cfg.consensus_timeout, 2.5)
+
+    def test_load_from_file_reloads_on_change(self):
+        """Test a modified file is parsed again"""
+        Config(self.config_path)
+
+        with open(self.config_path, 'w') as f:
+            json.dump({'consensus_timeout': 7.25}, f)
+
+        cfg = Config(self.config_path)
+        self.assertEqual(cfg.consensus_timeout, 7.25)
+
+    def test_load_from_file_missing(self):
+        """Test a missing file falls back to defaults"""
+        cfg = Config('/nonexistent/syncpay.json')
+
+        self.assertEqual(cfg.consensus_timeout, 2.0)
+
+    def test_node_configs_from_env(self):
+        """Test node configs are read from SYNCPAY_NODE_CONFIGS"""
+        node_configs = {'a': {'host': 'h1', 'port': 1}, 'b': {'host': 'h2', 'port': 2}}
+
+        with patch.dict(os.environ, {'SYNCPAY_NODE_CONFIGS': json.dumps(node_configs)}):
+            cfg1 = Config()
+            cfg1.node_configs['a']['port'] = 99
+            cfg2 = Config()
+
+        # Mutating one instance must not leak into the memoized parse
+        self.assertEqual(cfg2.node_configs, node_configs)
+        self.assertEqual(cfg2.get_peers('a'), ['h2:2'])
+
+    def test_get_shared_instance(self):
+        """Test Config.get returns one instance per file until the file changes"""
+        first = Config.get(self.config_path)
+        self.assertIs(Config.get(self.config_path), first)
+        self.assertIsNot(Config.get(), first)
+
+        with open(self.config_path, 'w') as f:
+            json.dump({'consensus_timeout': 9.0}, f)
+        os.utime(self.config_path, ns=(0, 0))
+
+        reloaded = Config.get(self.config_path)
+        self.assertIsNot(reloaded, first)
+        self.assertEqual(reloaded.consensus_timeout, 9.0)
+
+    def test_get_follows_env_changes(self):
+        """Test Config.get rebuilds the shared instance when an override changes"""
+        with patch.dict(os.environ, {'SYNCPAY_CONSENSUS_TIMEOUT': '1.5'}):
+            first = Config.get()
+            self.assertIs(Config.get(), first)
+
+        with patch.dict(os.environ, {'SYNCPAY_CONSENSUS_TIMEOUT': '2.5'}):
+            changed = Config.get()
+
+        self.assertIsNot(changed, first)
+        self.assertEqual(changed.consensus_timeout, 2.5)
+
+    def test_timeouts_from_env(self):
+        """Test numeric overrides from environment variables"""
+        env = {
+            'SYNCPAY_CONSENSUS_TIMEOUT': '1.5',
+            'SYNCPAY_REPLICATION_TIMEOUT': 'not-a-number'
+        }
+
+        with patch.dict(os.environ, env):
+            cfg = Config()
+
+        self.assertEqual(cfg.consensus_timeout, 1.5)
+        # Invalid values are ignored rather than aborting startup
+        self.assertEqual(cfg.replication_timeout, 5.0)
+
+    def test_node_urls(self):
+        """Test peer and node URL lookups"""
+        cfg = Config()
+
+        self.assertEqual(cfg.get_peers('node1'), ['localhost:5001', 'localhost:5002'])
+        self.assertEqual(cfg.get_node_url('node2'), 'localhost:5001')
+        self.assertIsNone(cfg.get_node_url('node9'))
+        self.assertEqual(cfg.get_all_node_urls(),
+                         ['localhost:5000', 'localhost:5001', 'localhost:5002'])
+
+        node = cfg.get_nodes()[0]
+        self.assertEqual((node.node_id, node.host, node.port, node.url),
+                         ('node1', 'localhost', 5000, 'localhost:5000'))
+
+        # A node outside the cluster sees every configured node as a peer
+        self.assertEqual(cfg.get_peers('outsider'), cfg.get_all_node_urls())
+
+    def test_default_node_configs_isolated(self):
+        """Test instances get their own copy of the default nodes"""
+        cfg1 = Config()
+        cfg1.node_configs['node1']['port'] = 9999
+        cfg2 = Config()
+
+        self.assertEqual(cfg2.node_configs['node1'], {'host': 'localhost', 'port': 5000})
+        self.assertEqual(Config._DEFAULT_NODE_CONFIGS['node1']['port'], 5000)
+
+    def test_node_urls_refresh_on_reload(self):
+        """Test peer lookups follow node_configs when env is reloaded"""
+        cfg = Config()
+        node_configs = {'a': {'host': 'h1', 'port': 1}, 'b': {'host': 'h2', 'port': 2}}
+
+        with patch.dict(os.environ, {'SYNCPAY_NODE_CONFIGS': json.dumps(node_configs)}):
+            cfg.load_from_env()
+
+        self.assertEqual(cfg.get_peers('b'), ['h1:1'])
+        self.assertEqual(cfg.get_node_url('a'), 'h1:1')
+
+    def test_save_and_reload(self):
+        """Test a saved config round-trips through load_from_file"""
+        cfg = Config()
+        cfg.replication_batch_size = 25
+        cfg.save_to_file(self.config_path)
+
+        reloaded = Config(self.config_path)
+        self.assertEqual(reloaded.replication_batch_size, 25)
+        self.assertEqual(reloaded.node_configs, cfg.node_configs)
+
+    def test_save_and_reload_stdlib_json(self):
+        """Test the stdlib fallback produces the same result without orjson"""
+        with patch.object(json_codec, 'orjson', None):
+            cfg = Config()
+            cfg.replication_batch_size = 25
+            cfg.save_to_file(self.config_path)
+
+            reloaded = Config(self.config_path)
+
+        self.assertEqual(reloaded.replication_batch_size, 25)
+
+    def test_save_output_stable(self):
+        """Test saved files are identical with and without orjson"""
+        cfg = Config()
+        cfg.save_to_file(self.config_path)
+        with open(self.config_path, 'rb') as f:
+            fast = f.read()
+
+        with patch.object(json_codec, 'orjson', None):
+            cfg.save_to_file(self.config_path)
+        with open(self.config_path, 'rb') as f:
+            slow = f.read()
+
+        self.assertEqual(fast, slow)
+        self.assertTrue(fast.startswith(b'{\n  "consensus_election_timeout_max"'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+# tests/test_consistency_manager.py
+# Unit tests for ConsistencyManager write paths
+
+import unittest
+import json
+import time
+import threading
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from replication.consistency_manager import ConsistencyManager, ConsistencyLevel
+from models import PaymentTransaction, transactions_digest
+from config import Config
+
+class TestConsistencyManager(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_node = Mock()
+        self.mock_node.node_id = 'test_node'
+        self.mock_node.config = Config()
+        self.mock_node._transaction_lock = threading.Lock()
+        self.peers = ['peer1:5001', 'peer2:5002', 'peer3:5003', 'peer4:5004']
+        self.transaction = PaymentTransaction.create(100.0, 'alice', 'bob', 'test_node')
+        
+        self.manager = ConsistencyManager(self.mock_node)
+    
+    def tearDown(self):
+        """Shut down the replication pool"""
+        self.manager.stop()
+    
+    def test_strong_consistency_replicates_concurrently(self):
+        """Test strong consistency sends to all peers at once"""
+        barrier = threading.Barrier(len(self.peers), timeout=2.0)
+        
+        def replicate(peer, transaction, sync=False):
+            # Only returns once every peer request is in flight
+            barrier.wait()
+            return True
+        
+        self.mock_node.replicator._send_replication_request.side_effect = replicate
+        self.manager.set_consistency_level(ConsistencyLevel.STRONG)
+        
+        self.assertTrue(self.manager.ensure_write_consistency(self.transaction, self.peers))
+        self.assertEqual(self.mock_node.replicator._send_replication_request.call_count, 4)
+    
+    def test_strong_consistency_fails_on_refusal(self):
+        """Test one refusing peer fails strong consistency"""
+        self.mock_node.replicator._send_replication_request.side_effect = \
+            lambda peer, transaction, sync=False: peer != 'peer2:5002'
+        self.manager.set_consistency_level(ConsistencyLevel.STRONG)
+        
+        self.assertFalse(self.manager.ensure_write_consistency(self.transaction, self.peers))
+    
+    def test_majority_returns_once_quorum_acks(self):
+        """Test majority consistency doesn't wait for slow peers"""
+        release = threading.Event()
+        
+        def replicate(peer, transaction, sync=False):
+            if peer in ('peer3:5003', 'peer4:5004'):
+                release.wait(2.0)
+            return True
+        
+        self.mock_node.replicator._send_replication_request.side_effect = replicate
+        self.manager.set_consistency_level(ConsistencyLevel.MAJORITY)
+        
+        start = time.monotonic()
+        result = self.manager.ensure_write_consistency(self.transaction, self.peers)
+        elapsed = time.monotonic() - start
+        release.set()
+        
+        # This node plus two fast peers is a majority of five
+        self.assertTrue(result)
+        self.assertLess(elapsed, 1.0)
+    
+    def test_majority_fails_without_quorum(self):
+        """Test majority consistency fails when too few peers acknowledge"""
+        self.mock_node.replicator._send_replication_request.side_effect = \
+            lambda peer, transaction, sync=False: peer == 'peer1:5001'
+        self.manager.set_consistency_level(ConsistencyLevel.MAJORITY)
+        
+        self.assertFalse(self.manager.ensure_write_consistency(self.transaction, self.peers))
+
+    def test_read_consistency_queries_peers_concurrently(self):
+        """Test read consistency checks all peers at once"""
+        peers = self.peers[:2]
+        self.mock_node.config.get_peers = Mock(return_value=peers)
+        self.mock_node.transactions = {self.transaction.id: self.transaction}
+        barrier = threading.Barrier(len(peers), timeout=2.0)
+        
+        def check_peer(peer, transaction_id):
+            # Only returns once every peer request is in flight
+            barrier.wait()
+            return {'has_transaction': True, 'transaction_data': self.transaction.to_dict()}
+        
+        self.manager._check_peer_transaction_state = check_peer
+        report = self.manager.check_read_consistency(self.transaction.id)
+        
+        self.assertTrue(report['consistent'])
+        self.assertEqual(list(report['node_states']), ['test_node'] + peers)
+
+    def test_consistency_check_fetches_each_peer_once(self):
+        """Test a cluster check fetches each diverging peer's transactions once"""
+        peers = self.peers[:2]
+        transactions = [PaymentTransaction.create(10.0 + i, 'alice', 'bob', 'test_node')
+                        for i in range(3)]
+        self.mock_node.config.get_peers = Mock(return_value=peers)
+        self.mock_node.transactions = {t.id: t for t in transactions}
+        
+        listing = Mock(status_code=200)
+        listing.content = json.dumps({'transactions': [t.to_dict() for t in transactions]}).encode()
+        
+        def get(url, params=None, timeout=None):
+            if url.endswith('/transactions/digest'):
+                # peer1 agrees on the sample; peer2's digest differs
+                ids = params['ids'].split(',')
+                digest = transactions_digest(self.mock_node.transactions, ids) if 'peer1' in url else 'stale'
+                return Mock(status_code=200, content=json.dumps({'digest': digest}).encode())
+            return listing
+        
+        self.manager.session.get = Mock(side_effect=get)
+        
+        report = self.manager.perform_consistency_check()
+        
+        self.assertTrue(report['overall_consistent'])
+        listed = [c[0][0] for c in self.manager.session.get.call_args_list
+                  if c[0][0].endswith('/transactions')]
+        self.assertEqual(listed, ['http://peer2:5002/transactions'])
+    
+    def test_consistency_check_samples_latest_transactions(self):
+        """Test the cluster check samples the 20 most recent transactions in order"""
+        transactions = [PaymentTransaction.create(1.0 + i, 'alice', 'bob', 'test_node')
+                        for i in range(25)]
+        self.mock_node.transactions = {t.id: t for t in transactions}
+        checked = []
+        self.manager._snapshot_peer_transactions = Mock(return_value={})
+        self.manager.check_read_consistency = \
+            lambda transaction_id, peer_snapshot=None: checked.append(transaction_id) or {'consistent': True}
+        
+        report = self.manager.perform_consistency_check()
+        
+        self.assertEqual(report['transaction_count'], 25)
+        self.assertEqual(checked, [t.id for t in transactions[-20:]])
+
+    def test_metrics_read_without_lock(self):
+        """Test level reads answer while a writer holds the lock"""
+        self.manager._update_version_vector(self.transaction)
+        
+        with self.manager.consistency_lock:
+            self.assertEqual(self.manager.get_consistency_level(), ConsistencyLevel.MAJORITY)
+        metrics = self.manager.get_consistency_metrics()
+        
+        self.assertEqual(metrics['version_vectors'], {'test_node': 1})
+        # Callers get a copy, not the live vector
+        self.assertIsNot(metrics['version_vectors'], self.manager.version_vectors)
+
+    def test_conflict_windows_expire(self):
+        """Test conflict counts cover the last hour and 30 minutes only"""
+        now = time.time()
+        with patch('replication.consistency_manager.time.time', return_value=now - 2400):
+            self.manager.resolve_conflicts([{'conflict_type': 'data_mismatch'}])
+        self.manager.resolve_conflicts([{'conflict_type': 'data_mismatch'}] * 2)
+        
+        self.assertEqual(self.manager._count_recent_conflicts(now), (3, 2))
+        # An hour later the early conflict is dropped from the log entirely
+        self.assertEqual(self.manager._count_recent_conflicts(now + 1900), (2, 0))
+        self.assertEqual(len(self.manager.conflict_resolution_log), 2)
+        
+        metrics = self.manager.get_consistency_metrics()
+        self.assertEqual(metrics['conflict_count'], 3)
+        self.assertEqual(metrics['recent_conflicts'], 2)
+
+    def test_transactions_match(self):
+        """Test transactions match only when every key field agrees"""
+        peer_data = self.transaction.to_dict()
+        self.assertTrue(self.manager._transactions_match(self.transaction, peer_data))
+        
+        self.assertFalse(self.manager._transactions_match(self.transaction, dict(peer_data, amount=99.0)))
+        self.assertFalse(self.manager._transactions_match(self.transaction, {'id': self.transaction.id}))
+        self.assertFalse(self.manager._transactions_match(self.transaction, None))
+
+if __name__ == '__main__':
+    unittest.main()
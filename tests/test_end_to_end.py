@@ -48,7 +48,7 @@ class TestSyncPayEndToEnd(unittest.TestCase):
                 cwd=src_dir,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                preexec_fn=os.setsid  # Create new process group
+                start_new_session=True  # New process group (setsid in C, no Python preexec hook)
             )
             cls.processes.append(process)
             time.sleep(3)  # Stagger startup
@@ -80,16 +80,17 @@ class TestSyncPayEndToEnd(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         """Stop the SyncPay cluster"""
+        # Kill every process group first, then reap; the nodes have nothing to flush
         for process in cls.processes:
             try:
-                # Kill process group to ensure all child processes are terminated
-                os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                process.wait(timeout=5)
-            except:
-                try:
-                    os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                except:
-                    pass
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, OSError):
+                pass
+        for process in cls.processes:
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
     
     def test_node_health_check(self):
         """Test health check endpoints"""
@@ -5,16 +5,21 @@ import unittest
 import time
 import threading
 import requests
+import tempfile
 import json
-from unittest.mock import patch
+import logging
+from logging.handlers import QueueHandler
+from unittest.mock import Mock, patch
 import sys
 import os
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import main
 from main import SyncPayNode
 from models import PaymentTransaction
+from utils import json_codec
 
 class TestSyncPayIntegration(unittest.TestCase):
     
@@ -185,6 +190,56 @@ class TestSyncPayIntegration(unittest.TestCase):
         # Test cluster health
         self.assertTrue(health_monitor.is_cluster_healthy())
     
+    def test_health_probe_uses_ping(self):
+        """Test peer probes hit /ping and /health still reports node state"""
+        node = self.nodes['node1']
+        health_monitor = node.health_monitor
+        health_monitor.peer_status = {'localhost:5101': {'is_healthy': True, 'consecutive_failures': 0}}
+
+        with patch.object(health_monitor.session, 'get', return_value=Mock(status_code=200)) as mock_get:
+            health_monitor._check_peer_health('localhost:5101')
+        self.assertEqual(mock_get.call_args[0][0], 'http://localhost:5101/ping')
+
+        data = node.app.test_client().get('/health').get_json()
+        self.assertEqual((data['node_id'], data['status'], data['is_leader']), ('node1', 'healthy', False))
+
+    def test_best_peer_for_request(self):
+        """Test the fastest healthy peer is chosen as response times change"""
+        health_monitor = self.nodes['node1'].health_monitor
+        health_monitor.peer_status = {
+            'localhost:5101': {'is_healthy': True, 'consecutive_failures': 0, 'response_time': 0.2},
+            'localhost:5102': {'is_healthy': True, 'consecutive_failures': 0, 'response_time': 0.1}
+        }
+        
+        self.assertEqual(health_monitor.get_best_peer_for_request(), 'localhost:5102')
+        
+        health_monitor._mark_peer_healthy('localhost:5102', 0.5)
+        self.assertEqual(health_monitor.get_best_peer_for_request(), 'localhost:5101')
+        
+        health_monitor.peer_status['localhost:5101']['is_healthy'] = False
+        self.assertEqual(health_monitor.get_best_peer_for_request(), 'localhost:5102')
+        
+        # Frequent updates don't grow the heap without bound
+        for _ in range(100):
+            health_monitor._mark_peer_healthy('localhost:5102', 0.5)
+        self.assertLessEqual(len(health_monitor._response_heap), 4 * 2 + 8)
+    
+    def test_health_check_backoff(self):
+        """Test peers that are down are probed less often than healthy ones"""
+        health_monitor = self.nodes['node1'].health_monitor
+        health_monitor.peer_status = {
+            'localhost:5101': {'is_healthy': True, 'consecutive_failures': 0},
+            'localhost:5102': {'is_healthy': False, 'consecutive_failures': 5}
+        }
+        interval = health_monitor.health_check_interval
+        
+        self.assertEqual(health_monitor._check_interval_for('localhost:5101'), interval)
+        self.assertEqual(health_monitor._check_interval_for('localhost:5102'), interval * 4)
+        
+        health_monitor.peer_status['localhost:5102']['consecutive_failures'] = 50
+        self.assertEqual(health_monitor._check_interval_for('localhost:5102'),
+                         health_monitor.max_backoff_interval)
+    
     def test_component_lifecycle(self):
         """Test starting and stopping all components"""
         node = self.nodes['node1']
@@ -223,6 +278,418 @@ class TestSyncPayIntegration(unittest.TestCase):
         self.assertFalse(node.time_sync.is_running)
         self.assertFalse(node.consensus.is_running)
     
+    def test_payment_consensus_outcomes(self):
+        """Test /payment maps consensus round results to responses"""
+        node = self.nodes['node1']
+        node.consensus.state = node.consensus.state.__class__.LEADER
+        client = node.app.test_client()
+        payment = {'amount': 10.0, 'sender': 'alice', 'receiver': 'bob'}
+
+        with patch.object(node.consensus, 'propose_transaction_batch', return_value=True), \
+             patch.object(node.replicator, 'replicate_transaction'):
+            response = client.post('/payment', json=payment)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.get_json()['transaction_id'], node.transactions)
+
+        with patch.object(node.consensus, 'propose_transaction_batch', return_value=False):
+            self.assertEqual(client.post('/payment', json=payment).status_code, 500)
+
+        with patch.object(node.consensus, 'propose_transaction_batch', side_effect=RuntimeError('boom')):
+            response = client.post('/payment', json=payment)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('boom', response.get_json()['error'])
+
+    def test_proposals_batched_per_round(self):
+        """Test payments queued during a consensus round go out together in the next one"""
+        node = self.nodes['node3']
+        release = threading.Event()
+        batches = []
+
+        def propose(transactions):
+            batches.append([t.id for t in transactions])
+            release.wait(2.0)
+            return True
+
+        transactions = [PaymentTransaction.create(20.0 + i, 'alice', 'bob', 'node3')
+                        for i in range(4)]
+        with patch.object(node.consensus, 'propose_transaction_batch', side_effect=propose):
+            futures = [node._submit_proposal(transactions[0])]
+            deadline = time.monotonic() + 2.0
+            while not batches and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # First round is in flight; these queue up behind it
+            futures += [node._submit_proposal(t) for t in transactions[1:]]
+            release.set()
+            results = [future.result(timeout=2.0) for future in futures]
+
+        self.assertEqual(results, [True] * 4)
+        self.assertEqual(batches, [[transactions[0].id], [t.id for t in transactions[1:]]])
+
+    def test_payment_clock_skew_fence(self):
+        """Test skewed timestamps are refused and repeated skew steps the leader down"""
+        node = self.nodes['node1']
+        consensus = node.consensus
+        consensus.state = consensus.state.__class__.LEADER
+        client = node.app.test_client()
+        payment = {'amount': 7.0, 'sender': 'alice', 'receiver': 'bob'}
+
+        with patch.object(node.time_sync, 'get_synchronized_time', return_value=time.time() + 60), \
+             patch.object(consensus, 'propose_transaction_batch') as mock_propose:
+            for _ in range(node.max_skew_strikes):
+                response = client.post('/payment', json=payment)
+                self.assertEqual(response.status_code, 503)
+
+        mock_propose.assert_not_called()
+        self.assertFalse(consensus.is_leader())
+        node._skew_strikes = 0
+
+    def test_payment_validation(self):
+        """Test /payment rejects malformed bodies before any consensus work"""
+        node = self.nodes['node1']
+        client = node.app.test_client()
+        cases = [
+            (None, "Request body is required"),
+            ({'amount': 5, 'sender': 'alice'}, "Missing required fields: amount, sender, receiver"),
+            ({'amount': 'lots', 'sender': 'alice', 'receiver': 'bob'}, "Invalid amount format"),
+            ({'amount': 'nan', 'sender': 'alice', 'receiver': 'bob'}, "Amount must be positive"),
+            ({'amount': 5, 'sender': ' bob ', 'receiver': 'bob'}, "Sender and receiver cannot be the same"),
+        ]
+
+        with patch.object(node.consensus, 'propose_transaction_batch') as mock_propose:
+            for body, error in cases:
+                response = client.post('/payment', json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json()['error'], error)
+
+        mock_propose.assert_not_called()
+
+    def test_payment_idempotency_key(self):
+        """Test a retried payment with the same Idempotency-Key skips consensus"""
+        node = self.nodes['node1']
+        node.consensus.state = node.consensus.state.__class__.LEADER
+        client = node.app.test_client()
+        payment = {'amount': 12.0, 'sender': 'alice', 'receiver': 'bob'}
+        headers = {'Idempotency-Key': 'retry-1'}
+
+        with patch.object(node.consensus, 'propose_transaction_batch', return_value=True) as mock_propose, \
+             patch.object(node.replicator, 'replicate_transaction'):
+            first = client.post('/payment', json=payment, headers=headers).get_json()
+            second = client.post('/payment', json=payment, headers=headers).get_json()
+            client.post('/payment', json=payment, headers={'Idempotency-Key': 'retry-2'})
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_propose.call_count, 2)
+
+        # The cache is bounded, dropping the least recently used key
+        self.addCleanup(setattr, node, 'idempotency_cache_size', node.idempotency_cache_size)
+        node.idempotency_cache_size = 1
+        node._reserve_idempotency_key('retry-3', ())
+        self.assertTrue(node._reserve_idempotency_key('retry-1', ())[2])
+
+    def test_payment_idempotency_key_concurrent(self):
+        """Test a retry sent while the original is in consensus waits for it instead of paying twice"""
+        node = self.nodes['node1']
+        node.consensus.state = node.consensus.state.__class__.LEADER
+        payment = {'amount': 13.0, 'sender': 'alice', 'receiver': 'bob'}
+        headers = {'Idempotency-Key': 'concurrent-1'}
+        proposing = threading.Event()
+        release = threading.Event()
+        proposed = []
+
+        def propose(transactions):
+            proposed.extend(t.id for t in transactions)
+            proposing.set()
+            release.wait(2.0)
+            return True
+
+        responses = []
+
+        def post():
+            responses.append(node.app.test_client().post('/payment', json=payment, headers=headers))
+
+        with patch.object(node.consensus, 'propose_transaction_batch', side_effect=propose), \
+             patch.object(node.replicator, 'replicate_transaction'):
+            first = threading.Thread(target=post)
+            first.start()
+            self.assertTrue(proposing.wait(2.0))
+            # The original is blocked in consensus when the retry arrives
+            second = threading.Thread(target=post)
+            second.start()
+            time.sleep(0.05)
+            release.set()
+            first.join(5.0)
+            second.join(5.0)
+
+        self.assertEqual(len(proposed), 1)
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.assertEqual({r.get_json()['transaction_id'] for r in responses}, set(proposed))
+
+    def test_payment_idempotency_key_after_timeout(self):
+        """Test a retry after a 504 gets the payment that committed late instead of a second one"""
+        node = self.nodes['node1']
+        node.consensus.state = node.consensus.state.__class__.LEADER
+        client = node.app.test_client()
+        payment = {'amount': 16.0, 'sender': 'alice', 'receiver': 'bob'}
+        headers = {'Idempotency-Key': 'late-1'}
+        release = threading.Event()
+        proposed = []
+
+        def propose(transactions):
+            proposed.extend(t.id for t in transactions)
+            release.wait(2.0)
+            return True
+
+        with patch.object(node.consensus, 'propose_transaction_batch', side_effect=propose), \
+             patch.object(node.replicator, 'replicate_transaction'), \
+             patch.object(node, '_payment_timeout', return_value=0.2):
+            self.assertEqual(client.post('/payment', json=payment, headers=headers).status_code, 504)
+            threading.Timer(0.05, release.set).start()
+            with patch.object(node, '_payment_timeout', return_value=2.0):
+                retry = client.post('/payment', json=payment, headers=headers)
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual([retry.get_json()['transaction_id']], proposed)
+        # The late commit was stored like any other
+        self.assertEqual(node.transactions[proposed[0]].status, 'confirmed')
+
+    def test_payment_idempotency_key_mismatch_and_release(self):
+        """Test a reused key with a different body is refused and a failed payment frees its key"""
+        node = self.nodes['node1']
+        node.consensus.state = node.consensus.state.__class__.LEADER
+        client = node.app.test_client()
+        payment = {'amount': 14.0, 'sender': 'alice', 'receiver': 'bob'}
+        headers = {'Idempotency-Key': 'release-1'}
+
+        with patch.object(node.consensus, 'propose_transaction_batch', return_value=False):
+            self.assertEqual(client.post('/payment', json=payment, headers=headers).status_code, 500)
+
+        with patch.object(node.consensus, 'propose_transaction_batch', return_value=True) as mock_propose, \
+             patch.object(node.replicator, 'replicate_transaction'):
+            # The failed attempt released the key, so the retry is processed
+            self.assertEqual(client.post('/payment', json=payment, headers=headers).status_code, 200)
+            response = client.post('/payment', json=dict(payment, amount=15.0), headers=headers)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(mock_propose.call_count, 1)
+
+    def test_transactions_ordered_and_paged(self):
+        """Test /transactions is served in timestamp order with since/limit"""
+        node = self.nodes['node2']
+        replicator = node.replicator
+        # Distinct amounts so deduplication doesn't reject them
+        for txn_id, timestamp in [('t3', 30.0), ('t1', 10.0), ('t2', 20.0)]:
+            request = Mock()
+            request.get_json.return_value = {'transaction': {
+                'id': txn_id, 'amount': timestamp, 'sender': 'alice', 'receiver': 'bob',
+                'timestamp': timestamp, 'status': 'confirmed', 'node_id': 'node1'
+            }}
+            replicator.handle_replication_request(request)
+
+        client = node.app.test_client()
+        ids = lambda response: [t['id'] for t in response.get_json()['transactions']]
+
+        self.assertEqual(ids(client.get('/transactions')), ['t1', 't2', 't3'])
+        self.assertEqual(ids(client.get('/transactions?since=10')), ['t2', 't3'])
+        self.assertEqual(ids(client.get('/transactions?limit=1')), ['t3'])
+        self.assertEqual(client.get('/transactions?limit=x').status_code, 400)
+
+    def test_ping_fast_path(self):
+        """Test GET /ping is answered before Flask routing with the same body"""
+        node = self.nodes['node2']
+        client = node.app.test_client()
+
+        with patch.object(node.app, 'full_dispatch_request') as mock_dispatch:
+            response = client.get('/ping')
+            mock_dispatch.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(response.get_json(), {"status": "ok", "node_id": "node2"})
+        # Other methods still go through the Flask route table
+        self.assertEqual(client.post('/ping').status_code, 405)
+
+    def test_transactions_compacted_to_snapshot(self):
+        """Test old transactions move to a disk snapshot that /transactions can page"""
+        node = self.nodes['node1']
+        client = node.app.test_client()
+        transactions = [PaymentTransaction.create(10.0 + i, 'alice', 'bob', 'node1')
+                        for i in range(5)]
+
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch.object(node.config, 'transaction_window_size', 2), \
+             patch.object(node, '_snapshot_path', os.path.join(tmp, 'node1.jsonl')), \
+             patch.object(node, '_snapshot_index', []):
+            for transaction in transactions:
+                print("stored", node.replicator._store_transaction(transaction), node.replicator.node is node, [q.qsize() for q in node._subscribers])
+
+            # The fifth insert exceeds two windows; all but the newest window is evicted
+            self.assertEqual(node.transaction_log, transactions[3:])
+            self.assertEqual(set(node.transactions), {t.id for t in transactions[3:]})
+            self.assertEqual(client.get('/transactions').get_json()['total_count'], 2)
+
+            data = client.get('/transactions?snapshot=0').get_json()
+            self.assertEqual([t['id'] for t in data['transactions']],
+                             [t.id for t in transactions[:3]])
+            self.assertEqual(data['snapshot_count'], 1)
+            self.assertEqual(client.get('/transactions?snapshot=1').status_code, 404)
+            self.assertEqual(client.get('/transactions?snapshot=x').status_code, 400)
+
+    def test_transactions_stream(self):
+        """Test stored transactions are pushed to /transactions/stream clients"""
+        node = self.nodes['node2']
+        response = node.app.test_client().get('/transactions/stream')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(len(node._subscribers), 1)
+
+        transaction = PaymentTransaction.create(42.0, 'alice', 'bob', 'node1')
+        node.replicator._store_transaction(transaction)
+
+        events = iter(response.response)
+        self.assertEqual(next(events), b': connected\n\n')
+        event = next(events)
+        self.assertTrue(event.startswith(b'data: ') and event.endswith(b'\n\n'))
+        self.assertEqual(json_codec.loads(event[6:])['id'], transaction.id)
+
+        # Closing the stream unsubscribes the client
+        response.close()
+        self.assertEqual(len(node._subscribers), 0)
+
+    def test_transactions_digest(self):
+        """Test nodes holding the same transactions report the same /transactions/digest"""
+        transactions = [PaymentTransaction.create(10.0 + i, 'alice', 'bob', 'node1') for i in range(3)]
+        for node in (self.nodes['node1'], self.nodes['node2']):
+            for transaction in transactions:
+                node.replicator._store_transaction(transaction)
+        ids = ','.join(t.id for t in transactions)
+
+        digests = [node.app.test_client().get(f'/transactions/digest?ids={ids}').get_json()['digest']
+                   for node in self.nodes.values()]
+
+        self.assertEqual(digests[0], digests[1])
+        # node3 has none of them
+        self.assertNotEqual(digests[0], digests[2])
+
+    def test_metrics_body_reused(self):
+        """Test /metrics bodies are rebuilt at most once per snapshot interval"""
+        node = self.nodes['node3']
+        client = node.app.test_client()
+        node._metrics_bodies.clear()
+
+        with patch.object(node.metrics, 'get_all_metrics', wraps=node.metrics.get_all_metrics) as mock_all, \
+             patch.object(node.metrics, 'get_summary', wraps=node.metrics.get_summary) as mock_summary:
+            first = client.get('/metrics')
+            self.assertEqual(client.get('/metrics').data, first.data)
+            self.assertEqual(first.get_json()['node_id'], 'node3')
+            self.assertEqual(mock_all.call_count, 1)
+
+            summary = client.get('/metrics?format=summary')
+            client.get('/metrics?format=summary')
+            self.assertEqual(summary.content_type, 'text/plain')
+            self.assertIn(b'=== Metrics for node3 ===', summary.data)
+            self.assertEqual(mock_summary.call_count, 1)
+
+            with patch.object(node.config, 'metrics_snapshot_interval_ms', 0.0):
+                client.get('/metrics?format=summary')
+            self.assertEqual(mock_summary.call_count, 2)
+
+    def test_json_provider(self):
+        """Test Flask JSON goes through json_codec, with and without orjson"""
+        node = self.nodes['node1']
+        provider = node.app.json
+        transaction = PaymentTransaction('t1', 5.0, 'alice', 'bob', 1.5)
+
+        with node.app.app_context():
+            for orjson_module in (json_codec.orjson, None):
+                with patch.object(json_codec, 'orjson', orjson_module):
+                    body = provider.response({'transaction': transaction}).data
+                    self.assertEqual(json.loads(body)['transaction']['id'], 't1')
+                    self.assertEqual(provider.loads(b'{"amount": 5.0}'), {'amount': 5.0})
+
+    def test_transaction_json_cached(self):
+        """Test a transaction's encoding is reused until its status changes"""
+        transaction = PaymentTransaction('t1', 5.0, 'alice', 'bob', 1.0)
+
+        encoded = transaction.to_json()
+        self.assertIs(transaction.to_json(), encoded)
+        self.assertEqual(json.loads(encoded), transaction.to_dict())
+
+        transaction.status = 'confirmed'
+        self.assertEqual(json.loads(transaction.to_json())['status'], 'confirmed')
+        # The cache lives in a slot and doesn't affect equality
+        self.assertFalse(hasattr(transaction, '__dict__'))
+        self.assertEqual(transaction, PaymentTransaction('t1', 5.0, 'alice', 'bob', 1.0, 'confirmed'))
+
+    def test_transactions_etag(self):
+        """Test the full /transactions body is reused and honours If-None-Match"""
+        node = self.nodes['node3']
+        client = node.app.test_client()
+        node.transaction_log.append(PaymentTransaction('t1', 5.0, 'alice', 'bob', 1.0))
+
+        first = client.get('/transactions')
+        self.assertEqual(first.get_json()['total_count'], 1)
+        etag = first.headers['ETag']
+
+        self.assertEqual(client.get('/transactions', headers={'If-None-Match': etag}).status_code, 304)
+
+        # A new entry changes the tag and the body
+        node.transaction_log.append(PaymentTransaction('t2', 6.0, 'alice', 'bob', 2.0))
+        second = client.get('/transactions', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_json()['total_count'], 2)
+
+    def test_serve_picks_server(self):
+        """Test serve() uses gevent's server unless in dev mode or gevent is missing"""
+        node = self.nodes['node1']
+
+        with patch.object(main, 'WSGIServer') as mock_server, \
+             patch.object(node.app, 'run') as mock_run:
+            node.serve()
+            mock_server.assert_called_once()
+            self.assertEqual(mock_server.call_args[0][0], ('localhost', 5000))
+            mock_server.return_value.serve_forever.assert_called_once()
+            mock_run.assert_not_called()
+
+            mock_server.reset_mock()
+            node.serve(dev=True)
+            mock_server.assert_not_called()
+            mock_run.assert_called_once_with(host='localhost', port=5000, debug=False, threaded=True)
+
+        with patch.object(main, 'WSGIServer', None), \
+             patch.object(node.app, 'run') as mock_run, \
+             patch('builtins.print'):
+            node.serve()
+            mock_run.assert_called_once()
+
+    def test_logging_through_queue(self):
+        """Test log records are handed to a background listener that writes the file"""
+        node = self.nodes['node1']
+        node._setup_logging()
+        root_logger = logging.getLogger()
+        self.assertEqual(len(root_logger.handlers), 1)
+        self.assertIsInstance(root_logger.handlers[0], QueueHandler)
+        log_path = main._log_listener.handlers[0].baseFilename
+
+        marker = f"queued-log-{time.time()}"
+        logging.getLogger('test').warning(marker)
+        # Stopping drains the queue into the file
+        main._stop_log_listener()
+        self.assertIsNone(main._log_listener)
+        main._stop_log_listener()
+
+        with open(log_path) as f:
+            self.assertIn(marker, f.read())
+        node._setup_logging()
+
+    def test_create_app(self):
+        """Test the WSGI app factory starts the node's services and exposes the node"""
+        with patch.object(SyncPayNode, 'start_services') as mock_start:
+            app = main.create_app('node2')
+
+        mock_start.assert_called_once()
+        node = app.extensions['syncpay_node']
+        self.assertIs(node.app, app)
+        self.assertEqual(node.node_id, 'node2')
+
     def test_batch_replication(self):
         """Test batch replication functionality"""
         replicator = self.nodes['node1'].replicator
@@ -2,6 +2,7 @@
 # Unit tests for PaymentReplicator component
 
 import unittest
+import json
 import time
 import threading
 from unittest.mock import Mock, patch, MagicMock
@@ -43,6 +44,18 @@ class TestPaymentReplicator(unittest.TestCase):
         self.assertEqual(self.replicator.num_workers, 3)
         self.assertFalse(self.replicator.is_running)
     
+    def test_session_pool_from_config(self):
+        """Test the pooled session is sized from Config"""
+        self.mock_node.config.http_pool_connections = 4
+        self.mock_node.config.http_pool_maxsize = 2
+
+        replicator = PaymentReplicator(self.mock_node)
+        adapter = replicator.session.get_adapter('http://peer1:5001')
+
+        self.assertEqual(adapter._pool_connections, 4)
+        # Never fewer pooled connections than workers sending concurrently
+        self.assertEqual(adapter._pool_maxsize, replicator.num_workers)
+
     def test_start_service(self):
         """Test starting the replication service"""
         with patch('threading.Thread') as mock_thread:
@@ -96,7 +109,7 @@ class TestPaymentReplicator(unittest.TestCase):
         # Mock successful response
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {'status': 'success'}
+        mock_response.content = json.dumps({'status': 'success'}).encode()
         
         # Mock the session.post method
         with patch.object(self.replicator.session, 'post', return_value=mock_response) as mock_post:
@@ -134,7 +147,33 @@ class TestPaymentReplicator(unittest.TestCase):
             result = self.replicator._send_replication_request('peer1:5001', transaction)
             
             self.assertFalse(result)
-    
+
+    def test_worker_batches_queued_transactions(self):
+        """Test queued transactions go to a peer in one batch request"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = json.dumps({'status': 'completed', 'failed_count': 0}).encode()
+        transactions = [PaymentTransaction.create(10.0 + i, 'alice', 'bob', 'test_node')
+                        for i in range(3)]
+
+        with patch.object(self.mock_node.config, 'get_peers', return_value=['peer1:5001']), \
+             patch.object(self.replicator.session, 'post', return_value=mock_response) as mock_post:
+            # Queue all three before the workers start
+            for transaction in transactions:
+                self.replicator.replicate_transaction(transaction)
+            self.replicator.start()
+
+            deadline = time.monotonic() + 2.0
+            while not mock_post.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.replicator.stop()
+
+        mock_post.assert_called_once()
+        self.assertEqual(mock_post.call_args[0][0], 'http://peer1:5001/replicate/batch')
+        sent = json.loads(mock_post.call_args[1]['data'])['transactions']
+        self.assertEqual([t['id'] for t in sent], [t.id for t in transactions])
+        self.assertEqual(self.replicator.replication_stats['total_successful'], 3)
+
     def test_handle_replication_request_success(self):
         """Test handling incoming replication request"""
         # Mock Flask request
@@ -160,6 +199,19 @@ class TestPaymentReplicator(unittest.TestCase):
         self.assertEqual(response['status'], 'success')
         self.assertIn('test-txn-123', self.mock_node.transactions)
     
+    def test_store_transaction_lock_scope(self):
+        """Test dedup registration runs after the node lock is released"""
+        lock = self.mock_node._transaction_lock
+        held = []
+        self.mock_dedup.register_transaction.side_effect = lambda txn: held.append(lock.locked())
+        transaction = PaymentTransaction.create(100.0, 'alice', 'bob', 'test_node')
+
+        self.assertTrue(self.replicator._store_transaction(transaction))
+        self.assertFalse(self.replicator._store_transaction(transaction))
+
+        self.assertEqual(held, [False])
+        self.assertEqual(self.mock_node.transaction_log, [transaction])
+
     def test_handle_replication_request_duplicate(self):
         """Test handling duplicate transaction"""
         # Mock deduplication to return duplicate
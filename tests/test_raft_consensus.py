@@ -2,6 +2,7 @@
 # Unit tests for RaftConsensus component
 
 import unittest
+import json
 import time
 from unittest.mock import Mock, patch
 import sys
@@ -36,6 +37,21 @@ class TestRaftConsensus(unittest.TestCase):
         self.assertEqual(len(self.raft.log), 0)
         self.assertFalse(self.raft.is_running)
     
+    def test_timing_from_config(self):
+        """Test election, heartbeat and RPC timeouts are read from Config"""
+        config = self.mock_node.config
+        config.consensus_heartbeat_interval = 0.5
+        config.consensus_election_timeout_min = 2.0
+        config.consensus_election_timeout_max = 4.0
+        config.consensus_timeout = 1.5
+
+        raft = RaftConsensus(self.mock_node)
+
+        self.assertEqual(raft.heartbeat_interval, 0.5)
+        self.assertEqual((raft.election_timeout_min, raft.election_timeout_max), (2.0, 4.0))
+        self.assertTrue(2.0 <= raft.election_timeout <= 4.0)
+        self.assertEqual(raft.consensus_timeout, 1.5)
+
     def test_is_leader(self):
         """Test leadership status checking"""
         # Initially not leader
@@ -48,7 +64,13 @@ class TestRaftConsensus(unittest.TestCase):
         # Back to follower
         self.raft.state = RaftState.FOLLOWER
         self.assertFalse(self.raft.is_leader())
-    
+
+    def test_is_leader_does_not_wait_on_lock(self):
+        """Test the leadership check answers while the consensus lock is held"""
+        self.raft.state = RaftState.LEADER
+        with self.raft.consensus_lock:
+            self.assertTrue(self.raft.is_leader())
+
     @patch('threading.Thread')
     def test_start_service(self, mock_thread):
         """Test starting the consensus service"""
@@ -75,6 +97,109 @@ class TestRaftConsensus(unittest.TestCase):
         self.assertFalse(self.raft.is_running)
         mock_thread.join.assert_called_with(timeout=5.0)
     
+    def test_peer_cache(self):
+        """Test peers and quorum size are cached until membership changes"""
+        self.assertEqual(len(self.raft._peers), 3)
+        self.assertEqual(self.raft._required_acks, 3)
+
+        with patch.object(self.mock_node.config, 'get_peers', return_value=['a:1', 'b:2']) as mock_peers:
+            self.raft.get_consensus_status()
+            mock_peers.assert_not_called()
+
+            self.raft.handle_peer_recovery('b:2')
+            self.assertEqual(self.raft._peers, ('a:1', 'b:2'))
+            self.assertEqual(self.raft._required_acks, 2)
+
+    def test_replicate_to_majority(self):
+        """Test replication succeeds once a majority of peers store the entry"""
+        self.raft.state = RaftState.LEADER
+        self.raft.current_term = 1
+        self.raft.log = [(1, 'txn-1')]
+        for peer in self.raft._peers:
+            self.raft.next_index[peer] = 1
+            self.raft.match_index[peer] = 0
+
+        acked = {'localhost:5000', 'localhost:5001'}
+        response = Mock(status_code=200)
+        response.content = json.dumps({'success': True}).encode()
+
+        def post(url, **kwargs):
+            if url.split('/')[2] not in acked:
+                raise ConnectionError('peer down')
+            return response
+
+        with patch.object(self.raft.session, 'post', side_effect=post):
+            self.assertTrue(self.raft._replicate_to_majority())
+            self.assertEqual(self.raft.commit_index, 1)
+
+            acked.clear()
+            self.raft.consensus_timeout = 0.1
+            self.raft.log.append((1, 'txn-2'))
+            self.assertFalse(self.raft._replicate_to_majority())
+            self.assertEqual(self.raft.commit_index, 1)
+
+        self.raft.stop()
+        self.assertIsNone(self.raft._executor)
+
+    def test_advance_commit_index(self):
+        """Test commit_index follows the majority match_index in the current term"""
+        self.raft.state = RaftState.LEADER
+        self.raft.current_term = 2
+        self.raft.log = [(1, 'txn-1'), (2, 'txn-2'), (2, 'txn-3')]
+
+        # An earlier-term entry on a majority isn't committed by counting
+        self.raft.match_index = {'localhost:5000': 1, 'localhost:5001': 1, 'localhost:5002': 0}
+        with self.raft.consensus_lock:
+            self.raft._advance_commit_index()
+        self.assertEqual(self.raft.commit_index, 0)
+
+        # Entries still in flight to the majority stay uncommitted
+        self.raft.match_index = {'localhost:5000': 3, 'localhost:5001': 2, 'localhost:5002': 0}
+        with self.raft.consensus_lock:
+            self.raft._advance_commit_index()
+        self.assertEqual(self.raft.commit_index, 2)
+
+    def test_send_heartbeats_skips_recent_peers(self):
+        """Test heartbeats are only sent to peers without recent contact"""
+        self.raft.state = RaftState.LEADER
+        self.raft.last_contact['localhost:5000'] = time.monotonic()
+        self.raft._heartbeats_in_flight.add('localhost:5001')
+
+        with patch.object(self.raft, '_send_append_entries') as mock_send:
+            self.raft._send_heartbeats()
+            self.raft._executor.shutdown(wait=True)
+
+        mock_send.assert_called_once_with('localhost:5002')
+
+    def test_heartbeat_reply_not_recorded_as_contact(self):
+        """Test an empty heartbeat's reply doesn't suppress the next heartbeat"""
+        peer = 'localhost:5001'
+        self.raft.log = [(1, 'txn-1')]
+        self.raft.next_index[peer] = 2
+        self.raft.match_index[peer] = 1
+
+        response = Mock(status_code=200)
+        response.content = json.dumps({'success': True}).encode()
+        with patch.object(self.raft.session, 'post', return_value=response):
+            self.assertTrue(self.raft._send_append_entries(peer))
+            self.assertNotIn(peer, self.raft.last_contact)
+
+            # An RPC that carried entries does count
+            self.raft.next_index[peer] = 1
+            self.assertTrue(self.raft._send_append_entries(peer))
+            self.assertIn(peer, self.raft.last_contact)
+
+    def test_stop_wakes_consensus_loop(self):
+        """Test stop() doesn't wait out the loop's election deadline"""
+        self.raft.last_election_time = time.monotonic()
+        self.raft.start()
+
+        started = time.time()
+        self.raft.stop()
+
+        self.assertLess(time.time() - started, 1.0)
+        self.assertFalse(self.raft.consensus_thread.is_alive())
+
     def test_propose_transaction_not_leader(self):
         """Test proposing transaction when not leader"""
         transaction = PaymentTransaction.create(100.0, 'alice', 'bob', 'test_node')
@@ -98,6 +223,20 @@ class TestRaftConsensus(unittest.TestCase):
             # Check log entry was added
             self.assertEqual(len(self.raft.log), 1)
             self.assertEqual(self.raft.log[0], (1, transaction.id))
+
+    def test_propose_transaction_batch(self):
+        """Test a batch is appended together and committed in one round"""
+        self.raft.state = RaftState.LEADER
+        self.raft.current_term = 1
+        transactions = [PaymentTransaction.create(10.0 + i, 'alice', 'bob', 'test_node')
+                        for i in range(3)]
+
+        with patch.object(self.raft, '_replicate_to_majority', return_value=True) as mock_replicate:
+            self.assertTrue(self.raft.propose_transaction_batch(transactions))
+
+        # One round, waiting on the last entry of the batch
+        mock_replicate.assert_called_once_with(3)
+        self.assertEqual(list(self.raft.log), [(1, t.id) for t in transactions])
     
     def test_start_election(self):
         """Test starting an election"""
@@ -114,6 +253,54 @@ class TestRaftConsensus(unittest.TestCase):
             self.assertEqual(self.raft.voted_for, self.mock_node.node_id)
             self.assertIn(self.mock_node.node_id, self.raft.votes_received)
     
+    def test_start_pre_election(self):
+        """Test a pre-election gauges support without bumping the term"""
+        old_term = self.raft.current_term
+
+        with patch.object(self.raft, '_request_pre_vote') as mock_pre_vote:
+            self.raft._start_pre_election()
+            self.raft._executor.shutdown(wait=True)
+
+        self.assertEqual(self.raft.current_term, old_term)
+        self.assertEqual(self.raft.state, RaftState.FOLLOWER)
+        self.assertIsNone(self.raft.voted_for)
+        self.assertEqual(mock_pre_vote.call_count, 3)
+
+    def test_pre_vote_majority_starts_election(self):
+        """Test the real election starts once a majority grants pre-votes"""
+        response = Mock(status_code=200)
+        response.content = json.dumps({'vote_granted': True, 'term': 0}).encode()
+
+        with patch.object(self.raft, '_request_pre_vote'):
+            self.raft._start_pre_election()
+
+        with patch.object(self.raft.session, 'post', return_value=response), \
+             patch.object(self.raft, '_start_election') as mock_election:
+            self.raft._request_pre_vote('localhost:5000')
+            mock_election.assert_not_called()
+            self.raft._request_pre_vote('localhost:5001')
+            mock_election.assert_called_once()
+
+    def test_handle_pre_vote(self):
+        """Test pre-votes are refused while a leader is alive and change no state"""
+        vote_data = {
+            'term': 1,
+            'candidate_id': 'candidate_node',
+            'last_log_index': 0,
+            'last_log_term': 0
+        }
+
+        response, status_code = self.raft._handle_pre_vote(vote_data)
+        self.assertEqual(status_code, 200)
+        self.assertTrue(response['vote_granted'])
+        self.assertIsNone(self.raft.voted_for)
+        self.assertEqual(self.raft.current_term, 0)
+
+        # Heard from the leader recently
+        self.raft.last_leader_contact = time.monotonic()
+        response, _ = self.raft._handle_pre_vote(vote_data)
+        self.assertFalse(response['vote_granted'])
+
     def test_become_leader(self):
         """Test becoming leader"""
         # Set up as candidate
@@ -202,6 +389,27 @@ class TestRaftConsensus(unittest.TestCase):
         self.assertEqual(self.raft.current_leader, 'leader_node')
         self.assertEqual(len(self.raft.log), 1)
     
+    def test_handle_append_entries_applies_commits(self):
+        """Test a follower applies entries as soon as leader_commit covers them"""
+        append_data = {
+            'term': 1,
+            'leader_id': 'leader_node',
+            'prev_log_index': 0,
+            'prev_log_term': 0,
+            'entries': [(1, 'txn-1'), (1, 'txn-2')],
+            'leader_commit': 1
+        }
+
+        self.raft._handle_append_entries(append_data)
+        self.assertEqual(self.raft.commit_index, 1)
+        self.assertEqual(self.raft.last_applied, 1)
+
+        # A heartbeat advancing leader_commit applies the rest
+        append_data.update(prev_log_index=2, prev_log_term=1, entries=[], leader_commit=5)
+        self.raft._handle_append_entries(append_data)
+        self.assertEqual(self.raft.commit_index, 2)
+        self.assertEqual(self.raft.last_applied, 2)
+
     def test_handle_append_entries_old_term(self):
         """Test handling append entries - old term"""
         self.raft.current_term = 10
@@ -237,6 +445,100 @@ class TestRaftConsensus(unittest.TestCase):
         self.assertEqual(status_code, 200)
         self.assertFalse(response['success'])
     
+    def test_handle_append_entries_out_of_order(self):
+        """Test a delayed RPC with an older prefix doesn't truncate the log"""
+        self.raft.log = [(5, 'txn-1'), (5, 'txn-2')]
+        append_data = {
+            'term': 5,
+            'leader_id': 'leader_node',
+            'prev_log_index': 0,
+            'prev_log_term': 0,
+            'entries': [(5, 'txn-1')],
+            'leader_commit': 0
+        }
+
+        response, status_code = self.raft._handle_append_entries(append_data)
+
+        self.assertTrue(response['success'])
+        self.assertEqual(self.raft.log, [(5, 'txn-1'), (5, 'txn-2')])
+
+        # A conflicting term still replaces the tail
+        append_data['entries'] = [(5, 'txn-1'), (6, 'txn-3')]
+        append_data['term'] = 6
+        self.raft._handle_append_entries(append_data)
+        self.assertEqual(self.raft.log, [(5, 'txn-1'), (6, 'txn-3')])
+
+    def test_send_append_entries_pipelines(self):
+        """Test next_index advances on send and match_index never moves back"""
+        peer = 'localhost:5001'
+        self.raft.log = [(1, 'txn-1'), (1, 'txn-2')]
+        self.raft.next_index[peer] = 2
+        self.raft.match_index[peer] = 2
+
+        response = Mock(status_code=200)
+        response.content = json.dumps({'success': True}).encode()
+        with patch.object(self.raft.session, 'post', return_value=response) as mock_post:
+            self.assertTrue(self.raft._send_append_entries(peer))
+
+        sent = json.loads(mock_post.call_args.kwargs['data'])['data']
+        self.assertEqual(sent['entries'], [[1, 'txn-2']])
+        self.assertEqual(self.raft.next_index[peer], 3)
+        self.assertEqual(self.raft.match_index[peer], 2)
+
+    def test_log_storage(self):
+        """Test the log behaves like a list of (term, txn_id) entries"""
+        self.raft.log = [(1, 'txn-1'), [2, 'txn-2']]
+
+        self.assertEqual(len(self.raft.log), 2)
+        self.assertEqual(self.raft.log[1], (2, 'txn-2'))
+        self.assertEqual(self.raft.log[1:], [(2, 'txn-2')])
+        self.assertEqual(self.raft.log.last_term(), 2)
+        self.assertEqual(list(self.raft.log.terms), [1, 2])
+
+        del self.raft.log[1:]
+        self.assertEqual(self.raft.log, [(1, 'txn-1')])
+
+        self.raft.log.clear()
+        self.assertEqual(self.raft.log.last_term(), 0)
+
+    def test_send_append_entries_stale_term(self):
+        """Test a response from an older term doesn't touch peer indexes"""
+        peer = 'localhost:5001'
+        self.raft.log = [(1, 'txn-1')]
+        self.raft.next_index[peer] = 1
+        self.raft.match_index[peer] = 0
+
+        response = Mock(status_code=200)
+        response.content = json.dumps({'success': True}).encode()
+
+        def post(*args, **kwargs):
+            # Term moves on while the request is in flight
+            self.raft.current_term += 1
+            return response
+
+        with patch.object(self.raft.session, 'post', side_effect=post):
+            self.assertFalse(self.raft._send_append_entries(peer))
+
+        self.assertEqual(self.raft.match_index[peer], 0)
+        self.assertNotIn(peer, self.raft.last_contact)
+
+    def test_heartbeat_body_reused(self):
+        """Test identical empty append_entries reuse the encoded body"""
+        first = self.raft._encode_append_entries('peer', 3, 2, 1, [], 2)
+        again = self.raft._encode_append_entries('peer', 3, 2, 1, [], 2)
+        self.assertIs(first, again)
+        self.assertEqual(json.loads(first)['data']['leader_commit'], 2)
+
+        # A new commit index produces a fresh body
+        bumped = self.raft._encode_append_entries('peer', 3, 2, 1, [], 3)
+        self.assertEqual(json.loads(bumped)['data']['leader_commit'], 3)
+
+        # Entries are never cached
+        with_entries = self.raft._encode_append_entries('peer', 3, 2, 1, [(3, 'txn')], 3)
+        self.assertEqual(json.loads(with_entries)['data']['entries'], [[3, 'txn']])
+        self.assertIsNot(self.raft._encode_append_entries('peer', 3, 2, 1, [(3, 'txn')], 3),
+                         with_entries)
+
     def test_is_log_up_to_date(self):
         """Test checking if candidate's log is up to date"""
         # Add some log entries